@@ -0,0 +1,207 @@
+""" 历史记录热点路径的基准测试，不需要图形界面
+
+用法：
+    python benchmarks/bench_history.py --sizes 1000,10000,100000 --output bench.json
+
+对每个规模生成合成数据，分别测量加载、保存（CSV 与二进制快照）、导入、导出（含流式导出的各种格式）和统计的耗时与峰值内存（tracemalloc），
+结果以 JSON 输出，便于在发布前比较。
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from core.analytics import TrendAnalyzer, TrendWindow  # noqa: E402
+from core.events import RecordRemoved, RecordsAdded  # noqa: E402
+from core.export import CHUNK_SIZE, HistoryExport  # noqa: E402
+from core.importer import CsvImport, MergeIndex  # noqa: E402
+from core.journal import HistoryJournal  # noqa: E402
+from core.query import HistoryQuery  # noqa: E402
+from core.snapshot import SNAPSHOT_FORMATS  # noqa: E402
+from core.sqlite_backend import SqliteBackend  # noqa: E402
+from core.stats import HistoryStats  # noqa: E402
+from core.store import HEADER, HistoryStore, format_timestamp  # noqa: E402
+
+NOTES = ['', '', '', '早上', '睡前', '手感不错', 'ちょっと疲れた', 'quick one', '看了新番']
+START = 1_500_000_000  # 2017-07-14
+
+
+def generate_rows(size: int, seed: int = 0) -> list[list]:
+    """ 生成与 history.csv 格式相同的合成数据，时间大致均匀地分布在几年之内 """
+    rng = random.Random(seed)
+    rows = []
+    timestamp = START
+    for _ in range(size):
+        timestamp += rng.randint(600, 6 * 3600)
+        duration = rng.randint(60, 40 * 60)
+        rows.append([format_timestamp(timestamp), duration // 60, duration % 60, rng.choice(NOTES)])
+    return rows
+
+
+def write_csv(path: Path, rows: list[list]):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+def measure(fn: Callable[[], object], memory: bool) -> dict:
+    """ 先单独计时，再在 tracemalloc 下重跑一次取峰值内存，避免跟踪开销影响计时 """
+    start = time.perf_counter()
+    fn()
+    result = {'seconds': time.perf_counter() - start}
+    if memory:
+        tracemalloc.start()
+        fn()
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def load_store(path: Path) -> HistoryStore:
+    """ 只解析快照；`HistoryJournal.load` 还会重写并 fsync 日志，那部分不属于加载的耗时 """
+    store = HistoryStore()
+    SNAPSHOT_FORMATS[path.suffix].load(path, store, [])
+    return store
+
+
+def bench_size(size: int, work_dir: Path, memory: bool) -> list[dict]:
+    rows = generate_rows(size)
+    source = work_dir / 'source.csv'
+    write_csv(source, rows)
+    store = load_store(source)
+
+    def load():
+        load_store(source)
+
+    # 每次运行写到新的文件，计时和测内存的两次运行互不影响
+    runs = itertools.count()
+
+    def save():
+        SNAPSHOT_FORMATS['.csv'].write(work_dir / f'save-{next(runs)}.csv', store)
+
+    binary = work_dir / 'history.bin'
+    SNAPSHOT_FORMATS['.bin'].write(binary, store)
+
+    def load_binary():
+        load_store(binary)
+
+    def save_binary():
+        SNAPSHOT_FORMATS['.bin'].write(work_dir / f'save-{next(runs)}.bin', store)
+
+    appended = [store.at(position) for position in range(min(100, len(store)))]
+
+    def journal_append():
+        journal = HistoryJournal(work_dir / f'append-{next(runs)}.csv')
+        target = HistoryStore()
+        journal.load(target)
+        for record in appended:
+            record_id = target.insert(0, record.timestamp, record.duration, record.note)
+            journal.record_added(0, target.get(record_id))
+        journal.close()
+
+    def import_csv():
+        target = HistoryStore()
+        index = MergeIndex(target)
+        for chunk, _ in CsvImport(source):
+            to_add, _ = index.merge(chunk)
+            target.merge(to_add)
+
+    def reimport_csv():
+        index = MergeIndex(store)
+        for chunk, _ in CsvImport(source):
+            index.merge(chunk)
+
+    def export_csv():
+        store.write_csv(work_dir / 'export.csv')
+
+    def stream_export(format: str, compression: str | None = None) -> Callable[[], None]:
+        def run():
+            job = HistoryExport(work_dir / HistoryExport.file_name('export', format, compression), format, compression)
+            job.run(HistoryQuery(store).pages(limit=CHUNK_SIZE), len(store))
+        return run
+
+    def sqlite_migrate():
+        db_file = work_dir / 'history.db'
+        for path in work_dir.glob('history.db*'):
+            path.unlink()
+        backend = SqliteBackend(db_file, legacy_snapshot=source)
+        backend.load(HistoryStore())
+        backend.close()
+
+    def stats_rebuild():
+        HistoryStats(store)
+
+    stats = HistoryStats(store)
+    records = [store.at(position) for position in range(min(1000, len(store)))]
+
+    def stats_incremental():
+        for record in records:
+            stats.handle(RecordRemoved(record))
+            stats.handle(RecordsAdded((record,)))
+
+    def trends_all():
+        TrendAnalyzer(store).report(TrendWindow.ALL)
+
+    benchmarks = {
+        'load': load,
+        'save': save,
+        'load_binary': load_binary,
+        'save_binary': save_binary,
+        'journal_append_100': journal_append,
+        'import': import_csv,
+        'reimport_dedup': reimport_csv,
+        'export': export_csv,
+        'export_stream_csv': stream_export('csv'),
+        'export_stream_jsonl_gzip': stream_export('jsonl', 'gzip'),
+        'export_stream_columnar_gzip': stream_export('columnar', 'gzip'),
+        'sqlite_migrate': sqlite_migrate,
+        'stats_rebuild': stats_rebuild,
+        'stats_incremental_2000_events': stats_incremental,
+        'trends_all': trends_all,
+    }
+    results = []
+    for name, fn in benchmarks.items():
+        result = {'name': name, 'rows': size, **measure(fn, memory)}
+        results.append(result)
+        print(f"{name:>32} {size:>9} rows {result['seconds'] * 1000:10.1f} ms", file=sys.stderr)
+    return results
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000', help='逗号分隔的数据规模，最大可以到 1000000')
+    parser.add_argument('--output', type=Path, help='结果 JSON 的保存路径，默认输出到标准输出')
+    parser.add_argument('--no-memory', action='store_true', help='不测量峰值内存（更快）')
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in (int(size) for size in args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as work_dir:
+            results.extend(bench_size(size, Path(work_dir), not args.no_memory))
+
+    report = json.dumps({
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }, indent=2)
+    if args.output:
+        args.output.write_text(report, encoding='utf-8')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+""" 与界面无关的核心：记录模型、持久化、统计和导入导出
+
+这个包不依赖 Flet，可以在命令行、基准测试或其他没有界面的环境中使用。
+"""
+from core.events import ChangeEvent, HistoryCleared, HistoryReplaced, RecordRemoved, RecordsAdded, RecordUpdated
+from core.index import DateIndex
+from core.importer import ColumnarImport, CsvImport, MergePolicy, MergeReport
+from core.observable import Observable
+from core.profiles import ProfileCache, Profiles
+from core.query import Cursor, HistoryQuery, Page, SortKey
+from core.repository import HistoryRepository
+from core.stats import HistoryStats
+from core.storage import open_backend
+from core.store import HistoryStore, Record, parse_row
+
+__all__ = [
+    'ChangeEvent',
+    'ColumnarImport',
+    'CsvImport',
+    'Cursor',
+    'DateIndex',
+    'HistoryCleared',
+    'HistoryQuery',
+    'HistoryReplaced',
+    'HistoryRepository',
+    'HistoryStats',
+    'HistoryStore',
+    'MergePolicy',
+    'MergeReport',
+    'Observable',
+    'Page',
+    'ProfileCache',
+    'Profiles',
+    'Record',
+    'RecordRemoved',
+    'RecordUpdated',
+    'RecordsAdded',
+    'SortKey',
+    'open_backend',
+    'parse_row',
+]
@@ -0,0 +1,112 @@
+""" 命令行工具：在没有界面的情况下批量处理历史记录
+
+用法（在 src 目录下）：
+    python -m core stats
+    python -m core stats --from 2024-01-01 --to 2024-03-31
+    python -m core list --offset 20 --limit 20
+    python -m core import backup.csv --policy overwrite
+    python -m core import backup.dhc.gz
+    python -m core export backup.csv
+    python -m core export backup.jsonl.gz
+    python -m core compact
+    python -m core --profile 工作 stats
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from core.export import COMPRESSIONS, FORMATS, HistoryExport
+from core.importer import CsvImport, ImportProgress, MergePolicy
+from core.profiles import Profiles
+from core.repository import HistoryRepository
+from core.stats import HistoryStats
+from core.storage import open_backend
+from core.store import to_timestamp
+
+
+def _print_progress(progress: ImportProgress):
+    print(f"\r已处理 {progress.rows} 行（{progress.percent:.0f}%，{progress.rows_per_second:.0f} 行/秒）", end='', file=sys.stderr)
+
+
+def _date(value: str) -> datetime:
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日期格式应为 YYYY-MM-DD: {value}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m core', description='批量处理历史记录')
+    parser.add_argument('--data-dir', type=Path, default=Path.cwd(), help='数据文件所在的目录，默认为当前目录')
+    parser.add_argument('--profile', help='档案名称，默认为上次在应用中使用的档案')
+    parser.add_argument('--storage', choices=['binary', 'csv', 'sqlite'], help='持久化方式，默认与应用相同')
+    commands = parser.add_subparsers(dest='command', required=True)
+    stats_parser = commands.add_parser('stats', help='输出统计数据')
+    stats_parser.add_argument('--from', dest='start', type=_date, metavar='YYYY-MM-DD', help='只统计这一天及之后的记录')
+    stats_parser.add_argument('--to', dest='end', type=_date, metavar='YYYY-MM-DD', help='只统计这一天及之前的记录')
+    list_parser = commands.add_parser('list', help='按时间从新到旧分页列出记录')
+    list_parser.add_argument('--offset', type=int, default=0, help='跳过的记录数')
+    list_parser.add_argument('--limit', type=int, default=20, help='最多列出的记录数')
+    import_parser = commands.add_parser('import', help='从 CSV 或列式格式导入并去重，按文件后缀选择格式和压缩方式')
+    import_parser.add_argument('file', type=Path)
+    import_parser.add_argument('--policy', choices=[policy.value for policy in MergePolicy], default=MergePolicy.SKIP.value,
+                               help='时间相同但内容不同时的处理方式')
+    export_parser = commands.add_parser('export', help='导出为 CSV、JSON Lines 或列式格式')
+    export_parser.add_argument('file', type=Path)
+    export_parser.add_argument('--format', choices=list(FORMATS), help='导出格式，默认按文件后缀选择')
+    export_parser.add_argument('--compression', choices=list(COMPRESSIONS), help='压缩方式，默认按文件后缀选择')
+    commands.add_parser('compact', help='立即整理存储')
+    args = parser.parse_args(argv)
+
+    profiles = Profiles(args.data_dir)
+    try:
+        work_dir = profiles.directory(args.profile or profiles.current)
+    except ValueError as ex:
+        print(f"失败: {ex}", file=sys.stderr)
+        return 1
+    repository = HistoryRepository(work_dir, open_backend(work_dir, args.storage))
+    if repository.rejected:
+        print(f"有 {len(repository.rejected)} 行历史数据无法读取，已跳过并另存到 {repository.backend.rejected_file}", file=sys.stderr)
+    try:
+        match args.command:
+            case 'stats' if args.start is not None or args.end is not None:
+                start = to_timestamp(args.start) if args.start is not None else -2 ** 63
+                end = to_timestamp(args.end + timedelta(days=1)) if args.end is not None else 2 ** 63 - 1
+                times = repository.count_between(start, end)
+                total_duration = sum(record.duration for record in repository.records_between(start, end))
+                print(f"区间次数: {times}")
+                print(f"平均持续时间: {round(total_duration / 60 / times, 2) if times else 0} 分钟")
+            case 'stats':
+                stats = HistoryStats(repository.store)
+                print(f"总次数: {stats.total_times}")
+                print(f"平均持续时间: {stats.avg_minute} 分钟")
+                print(f"本周次数: {stats.this_week_times}")
+                print(f"本月次数: {stats.this_month_times}")
+            case 'list':
+                for record in repository.page(args.offset, args.limit):
+                    print(record.date_time, f"{record.minute}:{record.second:02d}", record.note, sep='\t')
+            case 'import':
+                report = repository.import_csv(CsvImport.for_path(args.file), MergePolicy(args.policy), _print_progress)
+                print(file=sys.stderr)
+                print(f"新增 {report.new} 条，重复 {report.duplicate} 条，冲突 {report.conflicting} 条。")
+            case 'export':
+                job = HistoryExport.for_path(args.file)
+                job = HistoryExport(args.file, args.format or job.format, args.compression or job.compression)
+                rows = repository.export(job)
+                print(f"已导出 {rows} 条记录到 {args.file}")
+            case 'compact':
+                repository.compact()
+                print("整理完成。")
+    except (OSError, ValueError) as ex:
+        print(f"\n失败: {ex}", file=sys.stderr)
+        return 1
+    finally:
+        repository.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import threading
+from collections import Counter, OrderedDict
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from itertools import accumulate
+from operator import sub
+
+from core.events import ChangeEvent
+from core.index import month_key, week_key
+from core.store import HistoryStore, to_datetime, to_timestamp
+
+DAY = 24 * 60 * 60
+HOUR = 60 * 60
+ROLLING_DAYS = 7
+CACHE_SIZE = 16
+
+
+class TrendWindow(Enum):
+    """ 趋势视图可选的时间范围，值为天数，ALL 表示全部记录 """
+    WEEK = 7
+    MONTH = 30
+    QUARTER = 90
+    YEAR = 365
+    ALL = 0
+
+
+def today() -> int:
+    """ 今天的日序号，与时间戳一样按墙上时间计算 """
+    return to_timestamp(datetime.now()) // DAY
+
+
+def percentile(sorted_values: list[int], fraction: float) -> int:
+    """ 最近秩法的百分位数，`sorted_values` 必须已经排序且非空 """
+    rank = max(1, -(-len(sorted_values) * fraction // 1))
+    return sorted_values[int(rank) - 1]
+
+
+@dataclass(frozen=True)
+class TrendReport:
+    first_day: int
+    last_day: int
+    times: int
+    daily_counts: list[int]  # 从 first_day 到 last_day 每天的次数
+    weekly_counts: list[tuple[tuple[int, int], int]]  # (ISO 年, 周) 与次数，按时间排序
+    monthly_counts: list[tuple[tuple[int, int], int]]
+    rolling_avg_minutes: list[float]  # 每天截止当天最近 ROLLING_DAYS 天的平均持续分钟数，没有记录时为 0
+    longest_streak: int  # 连续有记录的最多天数
+    current_streak: int  # 截止今天（今天还没有记录时截止昨天）的连续天数
+    longest_gap: int  # 相邻两次之间最长的间隔秒数
+    median_gap: int
+    hour_histogram: list[int]  # 0~23 点各小时的次数
+    weekday_histogram: list[int]  # 周一到周日的次数
+    duration_percentiles: dict[int, int]  # 百分位 -> 持续秒数
+
+    @property
+    def days(self) -> int:
+        return self.last_day - self.first_day + 1
+
+
+class TrendAnalyzer:
+    """ 按时间范围计算趋势数据
+
+    所有统计都在列式数据上成批完成：先用时间戳列筛出范围内的记录，再用 `map`、`Counter`、
+    `accumulate` 等一次处理整列，不为每条记录构造 Record 或 datetime。
+    结果按 (范围, 今天) 缓存，数据有变化时清空缓存，来回切换范围不需要重新计算。
+
+    `report` 可以在任意线程中调用：范围内的数据在 `lock`（修改 store 时持有的锁）内复制出来，
+    之后的计算不持有锁；计算期间数据变化了的结果不会进入缓存。
+    """
+
+    def __init__(self, store: HistoryStore, lock: AbstractContextManager | None = None):
+        self.store = store
+        self.lock = lock or nullcontext()
+        self._cache: OrderedDict[tuple[TrendWindow, int], TrendReport] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._version = 0
+
+    def handle(self, event: ChangeEvent):
+        with self._cache_lock:
+            self._version += 1
+            self._cache.clear()
+
+    def report(self, window: TrendWindow) -> TrendReport:
+        key = (window, today())
+        with self._cache_lock:
+            report = self._cache.get(key)
+            if report is not None:
+                self._cache.move_to_end(key)
+                return report
+            version = self._version
+        report = self._compute(window, key[1])
+        with self._cache_lock:
+            if version == self._version:
+                self._cache[key] = report
+                if len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        return report
+
+    def _select(self, window: TrendWindow, last_day: int) -> tuple[list[int], list[int]]:
+        """ 范围内的时间戳和持续时间，按时间戳排序
+
+        store 按时间从新到旧排列，范围的两端用二分查找定位，只复制范围内的数据。
+        """
+        store = self.store
+        with self.lock:
+            if window is TrendWindow.ALL:
+                low, high = 0, len(store)
+            else:
+                start, end = (last_day - window.value + 1) * DAY, (last_day + 1) * DAY
+                low, high = store.insertion_point(end - 1), store.insertion_point(start - 1)
+            timestamps, durations = store.timestamps[low:high], store.durations[low:high]
+        pairs = sorted(zip(timestamps, durations))
+        return [timestamp for timestamp, _ in pairs], [duration for _, duration in pairs]
+
+    def _compute(self, window: TrendWindow, current_day: int) -> TrendReport:
+        timestamps, durations = self._select(window, current_day)
+        days = [timestamp // DAY for timestamp in timestamps]
+        if window is not TrendWindow.ALL:
+            first_day, last_day = current_day - window.value + 1, current_day
+        else:
+            first_day = min(days[0], current_day) if days else current_day
+            last_day = max(days[-1], current_day) if days else current_day
+        span = last_day - first_day + 1
+
+        day_counts = Counter(days)
+        daily_counts = [day_counts.get(day, 0) for day in range(first_day, last_day + 1)]
+        daily_durations = [0] * span
+        for day, duration in zip(days, durations):
+            daily_durations[day - first_day] += duration
+
+        weekly: Counter[tuple[int, int]] = Counter()
+        monthly: Counter[tuple[int, int]] = Counter()
+        for day, count in day_counts.items():
+            date_time = to_datetime(day * DAY)
+            weekly[week_key(date_time)] += count
+            monthly[month_key(date_time)] += count
+
+        count_sums = [0, *accumulate(daily_counts)]
+        duration_sums = [0, *accumulate(daily_durations)]
+        rolling = []
+        for end in range(1, span + 1):
+            begin = max(0, end - ROLLING_DAYS)
+            count = count_sums[end] - count_sums[begin]
+            rolling.append(round((duration_sums[end] - duration_sums[begin]) / 60 / count, 2) if count else 0)
+
+        longest_streak = streak = 0
+        for count in daily_counts:
+            streak = streak + 1 if count else 0
+            longest_streak = max(longest_streak, streak)
+        current_streak = 0
+        recent = daily_counts[:current_day - first_day + 1]
+        if recent and not recent[-1]:
+            recent = recent[:-1]
+        for count in reversed(recent):
+            if not count:
+                break
+            current_streak += 1
+
+        gaps = sorted(map(sub, timestamps[1:], timestamps[:-1]))
+        sorted_durations = sorted(durations)
+        return TrendReport(
+            first_day=first_day,
+            last_day=last_day,
+            times=len(timestamps),
+            daily_counts=daily_counts,
+            weekly_counts=sorted(weekly.items()),
+            monthly_counts=sorted(monthly.items()),
+            rolling_avg_minutes=rolling,
+            longest_streak=longest_streak,
+            current_streak=current_streak,
+            longest_gap=gaps[-1] if gaps else 0,
+            median_gap=percentile(gaps, 0.5) if gaps else 0,
+            hour_histogram=_histogram((timestamp % DAY // HOUR for timestamp in timestamps), 24),
+            weekday_histogram=_histogram(((day + 3) % 7 for day in days), 7),  # 1970-01-01 是周四
+            duration_percentiles={p: percentile(sorted_durations, p / 100) for p in (50, 90, 99)} if sorted_durations else {},
+        )
+
+
+def _histogram(values, size: int) -> list[int]:
+    counts = Counter(values)
+    return [counts.get(i, 0) for i in range(size)]
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from contextlib import AbstractContextManager, nullcontext
+from pathlib import Path
+from typing import Sequence
+
+from core.store import HistoryStore, Record
+
+
+class StorageBackend:
+    """ HistoryPage 的持久化接口
+
+    `load` 把数据读入内存中的 HistoryStore，之后每次修改 store 都要调用对应的方法。
+    `position` 是记录在 store 中的位置，新记录按时间插入到任意位置；
+    `records_added` 中一批记录的位置是依次插入后的位置，导入时它们是递增的。
+    查询方法的默认实现在按时间排序的 store 上二分查找，后端可以用索引覆盖它们。
+
+    读取已保存的数据时无法解析的行不会导致加载失败：它们被跳过，放在 `rejected` 中，
+    并追加保存到 `rejected_file`，由调用方提示用户。
+    """
+
+    store: HistoryStore
+    rejected: Sequence[list[str]] = ()
+    rejected_file: Path | None = None
+
+    def load(self, store: HistoryStore):
+        raise NotImplementedError
+
+    def records_added(self, records: list[tuple[int, Record]]):
+        raise NotImplementedError
+
+    def record_added(self, position: int, record: Record):
+        self.records_added([(position, record)])
+
+    def record_updated(self, position: int, record: Record):
+        raise NotImplementedError
+
+    def record_removed(self, position: int, record: Record):
+        raise NotImplementedError
+
+    def cleared(self):
+        raise NotImplementedError
+
+    def transaction(self) -> AbstractContextManager:
+        """ 把其中的多次写入合并成一次提交，默认不做合并 """
+        return nullcontext()
+
+    def maybe_compact(self, store: HistoryStore):
+        """ 给后端一个整理存储的机会，默认什么都不做 """
+
+    def compact(self, store: HistoryStore):
+        """ 立即整理存储，默认什么都不做 """
+
+    def rewrite(self, store: HistoryStore):
+        """ 按 store 的内容整个重写存储
+
+        写入失败后存储缺了一个操作，之后按位置追加的操作都会落到错误的记录上，
+        必须先用它让存储重新与内存一致。调用方持有修改 store 时的锁。
+        """
+        raise NotImplementedError
+
+    def count_between(self, start: int, end: int) -> int:
+        """ 时间戳在 [start, end) 内的记录数 """
+        store = self.store
+        return max(0, store.insertion_point(start - 1) - store.insertion_point(end - 1))
+
+    def records_between(self, start: int, end: int) -> list[Record]:
+        """ 时间戳在 [start, end) 内的记录，按时间排序 """
+        store = self.store
+        positions = range(store.insertion_point(start - 1) - 1, store.insertion_point(end - 1) - 1, -1)
+        return [store.at(position) for position in positions]
+
+    def page(self, offset: int, limit: int) -> list[Record]:
+        """ 按 store 中的顺序（时间从新到旧）分页 """
+        return [self.store.at(position) for position in range(offset, min(offset + limit, len(self.store)))]
+
+    def close(self):
+        pass
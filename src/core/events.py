@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from core.store import Record
+
+
+class ChangeEvent:
+    """ 历史记录变化事件的基类，订阅它可以收到所有类型的变化 """
+
+
+@dataclass(frozen=True)
+class RecordsAdded(ChangeEvent):
+    records: tuple[Record, ...]
+
+    @property
+    def ids(self) -> tuple[int, ...]:
+        return tuple(record.id for record in self.records)
+
+
+@dataclass(frozen=True)
+class RecordUpdated(ChangeEvent):
+    old: Record
+    new: Record
+
+    @property
+    def id(self) -> int:
+        return self.new.id
+
+
+@dataclass(frozen=True)
+class RecordRemoved(ChangeEvent):
+    record: Record
+
+    @property
+    def id(self) -> int:
+        return self.record.id
+
+
+@dataclass(frozen=True)
+class HistoryReplaced(ChangeEvent):
+    """ 整个历史被整体替换，订阅者应当从 store 重新构建自己的状态 """
+
+
+@dataclass(frozen=True)
+class HistoryCleared(HistoryReplaced):
+    pass
+
+
+def coalesce(events: list[ChangeEvent]) -> list[ChangeEvent]:
+    """ 合并一批事件：整体替换之前的事件都被丢弃，相邻的新增事件合并为一个 """
+    merged: list[ChangeEvent] = []
+    for event in events:
+        if isinstance(event, HistoryReplaced):
+            merged = [event]
+        elif isinstance(event, RecordsAdded) and merged and isinstance(merged[-1], RecordsAdded):
+            merged[-1] = RecordsAdded(merged[-1].records + event.records)
+        else:
+            merged.append(event)
+    return merged
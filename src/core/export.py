@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import bz2
+import csv
+import gzip
+import io
+import json
+import lzma
+import struct
+import sys
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+from core.store import HEADER, Record
+
+CHUNK_SIZE = 5000
+
+
+def _zstd_open() -> Callable[..., BinaryIO] | None:
+    try:
+        from compression import zstd  # Python 3.14 起才有
+    except ImportError:
+        return None
+    return zstd.open
+
+
+COMPRESSIONS: dict[str, Callable[..., BinaryIO]] = {
+    'gzip': gzip.open,
+    'bz2': bz2.open,
+    'xz': lzma.open,
+}
+if (zstd_open := _zstd_open()) is not None:
+    COMPRESSIONS['zstd'] = zstd_open
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz', 'zstd': '.zst'}
+
+
+class CsvFormat:
+    """ 与 history.csv 相同的格式，可以直接再导入 """
+
+    suffix = '.csv'
+
+    def __init__(self, f: BinaryIO):
+        self.text = io.TextIOWrapper(f, encoding='utf-8', newline='')
+        self.writer = csv.writer(self.text)
+        self.writer.writerow(HEADER)
+
+    def write(self, records: list[Record]):
+        self.writer.writerows(record.to_row() for record in records)
+
+    def close(self):
+        self.text.flush()
+        self.text.detach()
+
+
+class JsonLinesFormat:
+    """ 每行一个 JSON 对象，时间同时给出文本和时间戳，持续时间单位为秒 """
+
+    suffix = '.jsonl'
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+
+    def write(self, records: list[Record]):
+        self.f.write(''.join(
+            json.dumps({'date_time': record.date_time, 'timestamp': record.timestamp, 'duration': record.duration, 'note': record.note},
+                       ensure_ascii=False) + '\n'
+            for record in records
+        ).encode('utf-8'))
+
+    def close(self):
+        pass
+
+
+class ColumnarFormat:
+    """ 分组的列式二进制格式，适合再配合压缩使用
+
+    文件布局（小端）：
+        文件头 8 字节：magic、版本、保留字段
+        若干行组，每组：记录数 uint32、字符串堆长度 uint32，
+            时间戳列 int64（第一条为原值，之后为与前一条的差，按时间排列时差值很小，压缩率高）、
+            持续时间列 int64、备注序号列 uint32、本组去重后的备注（UTF-8，以 NUL 分隔）
+        记录数为 0 的行组表示文件结束
+    每组只依赖本组的数据，写入时不需要事先知道记录总数。
+    """
+
+    suffix = '.dhc'
+    MAGIC = b'DHCX'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHH')
+    GROUP = struct.Struct('<II')
+
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        f.write(self.HEADER.pack(self.MAGIC, self.VERSION, 0))
+
+    def write(self, records: list[Record]):
+        if not records:
+            return
+        timestamps = array('q', (record.timestamp for record in records))
+        deltas = array('q', [timestamps[0]])
+        deltas.extend(map(int.__sub__, timestamps[1:], timestamps))
+        durations = array('q', (record.duration for record in records))
+        table: dict[str, int] = {}
+        note_index = array('I', (table.setdefault(record.note, len(table)) for record in records))
+        heap = '\0'.join(note.replace('\0', '') for note in table).encode('utf-8')
+        columns = [deltas, durations, note_index]
+        if sys.byteorder == 'big':
+            for column in columns:
+                column.byteswap()
+        self.f.write(self.GROUP.pack(len(records), len(heap)))
+        for column in columns:
+            self.f.write(column.tobytes())
+        self.f.write(heap)
+
+    def close(self):
+        self.f.write(self.GROUP.pack(0, 0))
+
+    @classmethod
+    def read(cls, f: BinaryIO) -> Iterator[tuple[int, int, str]]:
+        """ 逐条读出 (时间戳, 持续秒数, 备注)，格式不正确时抛出 ValueError """
+        header = f.read(cls.HEADER.size)
+        if len(header) != cls.HEADER.size:
+            raise ValueError("文件格式不正确。")
+        magic, version, _ = cls.HEADER.unpack(header)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("文件格式不正确。")
+        while True:
+            header = f.read(cls.GROUP.size)
+            if len(header) != cls.GROUP.size:
+                raise ValueError("文件不完整。")
+            count, heap_size = cls.GROUP.unpack(header)
+            if count == 0:
+                return
+            columns = []
+            for typecode in 'qqI':
+                column = array(typecode)
+                data = f.read(count * column.itemsize)
+                if len(data) != count * column.itemsize:
+                    raise ValueError("文件不完整。")
+                column.frombytes(data)
+                columns.append(column)
+            if sys.byteorder == 'big':
+                for column in columns:
+                    column.byteswap()
+            deltas, durations, note_index = columns
+            notes = f.read(heap_size).decode('utf-8').split('\0')
+            if note_index and max(note_index) >= len(notes):
+                raise ValueError("文件格式不正确。")
+            timestamp = 0
+            for delta, duration, index in zip(deltas, durations, note_index):
+                timestamp += delta
+                yield timestamp, duration, notes[index]
+
+
+FORMATS = {
+    'csv': CsvFormat,
+    'jsonl': JsonLinesFormat,
+    'columnar': ColumnarFormat,
+}
+
+
+@dataclass(frozen=True)
+class ExportProgress:
+    rows: int
+    total: int
+    elapsed: float
+
+    @property
+    def percent(self) -> float:
+        return self.rows * 100 / self.total if self.total else 100
+
+
+class HistoryExport:
+    """ 流式导出
+
+    数据由调用方按批提供（见 `HistoryRepository.export`），每批写完就丢弃，内存占用与记录总数无关。
+    格式见 `FORMATS`，压缩见 `COMPRESSIONS`（都来自标准库，zstd 需要 Python 3.14）。
+    `cancel` 可以在其他线程中调用，当前批次写完后停止并删除写了一半的文件。
+    """
+
+    def __init__(self, path: Path, format: str = 'csv', compression: str | None = None):
+        if format not in FORMATS:
+            raise ValueError(f"未知的导出格式: {format}")
+        if compression is not None and compression not in COMPRESSIONS:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        self.path = path
+        self.format = format
+        self.compression = compression
+        self.rows = 0
+        self._cancelled = threading.Event()
+
+    @classmethod
+    def for_path(cls, path: Path) -> HistoryExport:
+        """ 按文件后缀选择格式和压缩方式，例如 `history.jsonl.gz`，无法识别时使用 CSV """
+        suffixes = [suffix.lower() for suffix in path.suffixes]
+        compression = next((name for name, suffix in COMPRESSION_SUFFIXES.items()
+                            if suffixes and suffixes[-1] == suffix and name in COMPRESSIONS), None)
+        if compression is not None:
+            suffixes.pop()
+        format = next((name for name, cls_ in FORMATS.items() if suffixes and suffixes[-1] == cls_.suffix), 'csv')
+        return cls(path, format, compression)
+
+    @staticmethod
+    def file_name(stem: str, format: str, compression: str | None) -> str:
+        return stem + FORMATS[format].suffix + (COMPRESSION_SUFFIXES[compression] if compression else '')
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _open(self) -> BinaryIO:
+        if self.compression is None:
+            return open(self.path, 'wb')
+        return COMPRESSIONS[self.compression](self.path, 'wb')
+
+    def run(
+        self,
+        chunks: Iterable[list[Record]],
+        total: int,
+        on_progress: Callable[[ExportProgress], None] | None = None
+    ) -> int:
+        """ 写入全部批次，返回写入的记录数；取消或出错时删除文件 """
+        start = time.perf_counter()
+        try:
+            with self._open() as f:
+                writer = FORMATS[self.format](f)
+                for records in chunks:
+                    writer.write(records)
+                    self.rows += len(records)
+                    if on_progress is not None:
+                        on_progress(ExportProgress(self.rows, total, time.perf_counter() - start))
+                    if self.cancelled:
+                        break
+                writer.close()
+        except BaseException:
+            self.path.unlink(missing_ok=True)
+            raise
+        if self.cancelled:
+            self.path.unlink(missing_ok=True)
+        return self.rows
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import csv
+import io
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+from core.export import COMPRESSIONS, ColumnarFormat, HistoryExport
+from core.profiling import PROFILER
+from core.store import HEADER, HistoryStore, Record, parse_row
+
+CHUNK_SIZE = 2000
+
+
+@dataclass(frozen=True)
+class ImportProgress:
+    rows: int
+    bytes_read: int
+    total_bytes: int
+    elapsed: float
+
+    @property
+    def percent(self) -> float:
+        return 100 * self.bytes_read / self.total_bytes if self.total_bytes else 100
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0
+
+
+@contextmanager
+def _open_source(path: Path, compression: str | None) -> Iterator[tuple[BinaryIO, BinaryIO]]:
+    """ 打开要导入的文件，返回 (磁盘上的文件, 解压后的数据流)，进度按前者读到的位置计算 """
+    with open(path, 'rb') as raw:
+        if compression is None:
+            yield raw, raw
+            return
+        with COMPRESSIONS[compression](raw, 'rb') as f:
+            yield raw, f
+
+
+class CsvImport:
+    """ 流式读取 CSV 文件
+
+    迭代时每次产出一批解析好的 (时间戳, 持续秒数, 备注) 和当前进度，不会把整个文件读进内存。
+    每批数据都先完整校验再产出，调用方逐批提交即可保证已提交的部分都是合法的。
+    `compression` 是 `COMPRESSIONS` 中的名称，文件按该方式边读边解压。
+    `cancel` 可以在其他线程中调用，迭代会在当前批次结束后停止。
+    """
+
+    def __init__(self, path: Path, chunk_size: int = CHUNK_SIZE, compression: str | None = None):
+        if compression is not None and compression not in COMPRESSIONS:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        self.path = path
+        self.chunk_size = chunk_size
+        self.compression = compression
+        self.rows = 0
+        self._cancelled = threading.Event()
+
+    @classmethod
+    def for_path(cls, path: Path) -> CsvImport:
+        """ 按文件后缀选择格式和压缩方式，规则与 `HistoryExport.for_path` 相同，例如 `history.dhc.gz` """
+        job = HistoryExport.for_path(path)
+        importers = {'csv': CsvImport, 'columnar': ColumnarImport}
+        if job.format not in importers:
+            raise ValueError(f"不支持导入该格式: {job.format}")
+        return importers[job.format](path, compression=job.compression)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def __iter__(self) -> Iterator[tuple[list[tuple[int, int, str]], ImportProgress]]:
+        start = time.perf_counter()
+        total_bytes = os.path.getsize(self.path)
+        with _open_source(self.path, self.compression) as (raw, f):
+            chunk = []
+            for row in self._read(f):
+                chunk.append(row)
+                if len(chunk) == self.chunk_size:
+                    yield self._emit(chunk, raw.tell(), total_bytes, start)
+                    chunk = []
+                    if self.cancelled:
+                        return
+            if chunk:
+                yield self._emit(chunk, total_bytes, total_bytes, start)
+
+    def _read(self, f: BinaryIO) -> Iterator[tuple[int, int, str]]:
+        reader = csv.reader(io.TextIOWrapper(f, encoding='utf-8', newline=''))
+        if next(reader, None) != HEADER:
+            raise ValueError("文件格式不正确，标题不匹配。")
+        for row in reader:
+            if not row:
+                continue
+            try:
+                yield parse_row(row)
+            except ValueError as ex:
+                raise ValueError(f"第 {reader.line_num} 行格式不正确: {ex}") from ex
+
+    def _emit(self, chunk: list, bytes_read: int, total_bytes: int, start: float):
+        self.rows += len(chunk)
+        PROFILER.count('rows_parsed', len(chunk))
+        return chunk, ImportProgress(self.rows, bytes_read, total_bytes, time.perf_counter() - start)
+
+
+class ColumnarImport(CsvImport):
+    """ 流式读取 `ColumnarFormat` 导出的文件，分批和进度与 `CsvImport` 相同 """
+
+    def _read(self, f: BinaryIO) -> Iterator[tuple[int, int, str]]:
+        return ColumnarFormat.read(f)
+
+
+class MergePolicy(Enum):
+    """ 导入的记录与已有记录时间相同但内容不同（冲突）时的处理方式 """
+    SKIP = 'skip'  # 保留已有记录
+    OVERWRITE = 'overwrite'  # 用导入的记录覆盖已有记录
+    KEEP_BOTH = 'keep_both'  # 两条都保留
+
+
+@dataclass
+class MergeReport:
+    new: int = 0
+    duplicate: int = 0
+    conflicting: int = 0
+
+
+class MergeIndex:
+    """ 导入去重用的哈希索引
+
+    以 (时间戳, 持续秒数, 备注) 判断完全重复，以时间戳判断冲突，每行的查找都是 O(1)。
+    索引在导入开始时从 store 构建一次，之后随着导入的每一行更新，
+    所以同一个文件中重复出现的行也会被去掉。
+    """
+
+    def __init__(self, store: HistoryStore, policy: MergePolicy = MergePolicy.SKIP):
+        self.policy = policy
+        self.report = MergeReport()
+        rows = list(zip(store.timestamps, store.durations, store.notes))
+        self._keys = set(rows)
+        self._by_timestamp = dict(zip(store.timestamps, zip(store.ids, rows)))
+
+    def merge(self, rows: list[tuple[int, int, str]]) -> tuple[list[tuple[int, int, str]], list[tuple[int, tuple[int, int, str]]]]:
+        """ 把一批数据分成需要新增的行和需要覆盖的 (记录 id, 行)，同时累计统计
+
+        新增的行提交后要调用 `added` 登记它们的 id。
+        """
+        to_add, to_update = [], []
+        pending: dict[int, int] = {}  # 本批新增行的时间戳 -> 在 to_add 中的下标
+        for row in rows:
+            if row in self._keys:
+                self.report.duplicate += 1
+                continue
+
+            timestamp = row[0]
+            existing = self._by_timestamp.get(timestamp)
+            if existing is None and timestamp not in pending:
+                self.report.new += 1
+                pending[timestamp] = len(to_add)
+                to_add.append(row)
+                self._keys.add(row)
+                continue
+
+            self.report.conflicting += 1
+            match self.policy:
+                case MergePolicy.SKIP:
+                    continue
+                case MergePolicy.KEEP_BOTH:
+                    to_add.append(row)
+                case MergePolicy.OVERWRITE if timestamp in pending:
+                    self._keys.discard(to_add[pending[timestamp]])
+                    to_add[pending[timestamp]] = row
+                case MergePolicy.OVERWRITE:
+                    record_id, old_row = existing
+                    self._keys.discard(old_row)
+                    self._by_timestamp[timestamp] = (record_id, row)
+                    to_update.append((record_id, row))
+            self._keys.add(row)
+        return to_add, to_update
+
+    def added(self, records: Iterable[Record]):
+        for record in records:
+            self._by_timestamp.setdefault(record.timestamp, (record.id, (record.timestamp, record.duration, record.note)))
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import datetime
+
+from core.events import ChangeEvent, HistoryReplaced, RecordRemoved, RecordsAdded, RecordUpdated
+from core.store import HistoryStore, Record, to_datetime
+
+BULK_THRESHOLD = 64  # 一次添加超过这么多条时整体重排，而不是逐条插入
+
+
+def week_key(date_time: datetime) -> tuple[int, int]:
+    """ ISO 周的键，包含 ISO 年份，跨年的同一周号不会混在一起 """
+    year, week, _ = date_time.isocalendar()
+    return year, week
+
+
+def month_key(date_time: datetime) -> tuple[int, int]:
+    return date_time.year, date_time.month
+
+
+class DateIndex:
+    """ 按日期组织的记录索引，随变化事件增量维护
+
+    - `weeks`、`months`：ISO 周和月份到记录 id 集合的映射，按周期计数不需要扫描；
+    - `timestamps`：有序的时间戳数组，任意时间范围内的次数用二分查找得到。
+
+    事件处理和查询都在 `_lock` 内进行，查询可以在任意线程中调用。
+    """
+
+    def __init__(self, store: HistoryStore):
+        self.store = store
+        self._lock = threading.Lock()
+        self.rebuild()
+
+    def rebuild(self):
+        self.weeks: defaultdict[tuple[int, int], set[int]] = defaultdict(set)
+        self.months: defaultdict[tuple[int, int], set[int]] = defaultdict(set)
+        for record_id, timestamp in zip(self.store.ids, self.store.timestamps):
+            self._add_to_buckets(record_id, timestamp)
+        self.timestamps = array('q', sorted(self.store.timestamps))
+
+    def _add_to_buckets(self, record_id: int, timestamp: int):
+        date_time = to_datetime(timestamp)
+        self.weeks[week_key(date_time)].add(record_id)
+        self.months[month_key(date_time)].add(record_id)
+
+    def _remove_from_buckets(self, record_id: int, timestamp: int):
+        date_time = to_datetime(timestamp)
+        for buckets, key in ((self.weeks, week_key(date_time)), (self.months, month_key(date_time))):
+            bucket = buckets[key]
+            bucket.discard(record_id)
+            if not bucket:
+                del buckets[key]
+
+    def _add(self, records: tuple[Record, ...]):
+        for record in records:
+            self._add_to_buckets(record.id, record.timestamp)
+        if len(records) > BULK_THRESHOLD:
+            self.timestamps.extend(record.timestamp for record in records)
+            self.timestamps = array('q', sorted(self.timestamps))
+        else:
+            for record in records:
+                insort(self.timestamps, record.timestamp)
+
+    def _remove(self, record: Record):
+        self._remove_from_buckets(record.id, record.timestamp)
+        del self.timestamps[bisect_left(self.timestamps, record.timestamp)]
+
+    def handle(self, event: ChangeEvent):
+        with self._lock:
+            match event:
+                case RecordsAdded(records=records):
+                    self._add(records)
+                case RecordUpdated(old=old, new=new):
+                    self._remove(old)
+                    self._add((new,))
+                case RecordRemoved(record=record):
+                    self._remove(record)
+                case HistoryReplaced():
+                    self.rebuild()
+
+    def week_count(self, key: tuple[int, int]) -> int:
+        with self._lock:
+            return len(self.weeks.get(key, ()))
+
+    def month_count(self, key: tuple[int, int]) -> int:
+        with self._lock:
+            return len(self.months.get(key, ()))
+
+    def count_between(self, start: int, end: int) -> int:
+        """ 时间戳在 [start, end) 内的记录数 """
+        with self._lock:
+            return max(0, bisect_left(self.timestamps, end) - bisect_left(self.timestamps, start))
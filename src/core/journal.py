@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from core.backend import StorageBackend
+from core.profiling import PROFILER
+from core.snapshot import SNAPSHOT_FORMATS
+from core.store import HistoryStore, Record, save_rejected
+
+
+def fsync_dir(path: Path):
+    """ 同步目录项，保证 rename 在掉电后依然生效（Windows 上无法打开目录，直接跳过） """
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class HistoryJournal(StorageBackend):
+    """ 快照 + 追加日志的持久化方式
+
+    快照的格式由文件后缀决定：`history.bin` 是二进制快照（默认），`history.csv` 是文本快照，
+    见 `core.snapshot`。每次增删改只向对应的日志文件追加一行 JSON 并 fsync，
+    启动时先读快照再重放日志。日志的第一行记录了它所基于的快照的 CRC32，
+    快照被替换后旧日志不会被误重放。
+
+    日志中的操作按记录在 store 中的位置而不是 id 定位，因为 id 只在本次运行中有效。
+    位置递增的连续添加（一次导入）重放时用 `insert_many` 一起插入。
+    日志累积到 `COMPACT_THRESHOLD` 条后会在后台线程中压缩：把 store 的副本写成新快照，
+    再用压缩期间新追加的操作生成新日志，两个文件都先写临时文件、fsync 后再 rename。
+
+    文本快照中无法解析的行（例如手工改坏了的日期）在加载时被跳过并另存到 `history.csv.rejected`，
+    随后立即用读到的数据重写快照，下次启动不会再重复报告。`repair=False` 时不保存也不重写快照，
+    用于从旧数据迁移，跳过的行由迁移方保存。
+    """
+
+    COMPACT_THRESHOLD = 500
+
+    def __init__(self, snapshot_file: Path, legacy_csv: Path | None = None, repair: bool = True):
+        self.snapshot_file = snapshot_file
+        self.legacy_csv = legacy_csv
+        self.repair = repair
+        self.rejected: list[list[str]] = []
+        self.rejected_file = snapshot_file.with_suffix(snapshot_file.suffix + '.rejected')
+        self.format = SNAPSHOT_FORMATS[snapshot_file.suffix]
+        self.journal_file = snapshot_file.with_suffix(self.format.journal_suffix)
+        self._new_journal_file = self.journal_file.with_suffix(self.journal_file.suffix + '.new')
+        self._tmp_snapshot_file = snapshot_file.with_suffix(snapshot_file.suffix + '.tmp')
+        self._lock = threading.Lock()
+        self._file = None
+        self._ops = 0
+        self._tail: list[str] | None = None  # 压缩期间追加的日志行
+        self._pending: list[str] | None = None  # 事务中尚未写入的日志行
+        self._compaction: threading.Thread | None = None
+
+    def load(self, store: HistoryStore):
+        """ 读取快照并重放日志，必要时修复上次被中断的写入 """
+        self.store = store
+        if not self.snapshot_file.exists():
+            self._write_snapshot(self._load_legacy())
+        base = self.format.load(self.snapshot_file, store, self.rejected)
+
+        # 压缩在替换快照之后、替换日志之前被中断：新日志已经对应当前快照
+        if self._new_journal_file.exists():
+            if self._read_base(self._new_journal_file) == base:
+                os.replace(self._new_journal_file, self.journal_file)
+            else:
+                self._new_journal_file.unlink()
+
+        lines = []
+        if self.journal_file.exists() and self._read_base(self.journal_file) == base:
+            inserts: list[tuple[int, int, int, str]] = []
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                next(f)
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        break  # 进程在写入这一行时被杀，之后的内容都不可信
+                    # 导入时的一批记录位置递增，攒起来一次插入
+                    if op['op'] == 'add' and (not inserts or op['pos'] > inserts[-1][0]):
+                        inserts.append((op['pos'], op['ts'], op['dur'], op['note']))
+                    else:
+                        self._insert(store, inserts)
+                        if op['op'] == 'add':
+                            inserts = [(op['pos'], op['ts'], op['dur'], op['note'])]
+                        else:
+                            inserts = []
+                            self._replay(store, op)
+                    lines.append(line if line.endswith('\n') else line + '\n')
+            self._insert(store, inserts)
+
+        if self.rejected and self.repair:
+            save_rejected(self.rejected_file, self.rejected)
+            base, lines = self._write_snapshot(store), []
+        self._write_journal(self.journal_file, base, lines)
+        self._ops = len(lines)
+        self._file = open(self.journal_file, 'a', encoding='utf-8')
+
+    def _load_legacy(self) -> HistoryStore:
+        """ 第一次使用二进制快照时，读入原来的 CSV 快照和日志，原文件保留不动 """
+        legacy = HistoryStore()
+        if self.legacy_csv is not None and self.legacy_csv.exists() and self.legacy_csv != self.snapshot_file:
+            journal = HistoryJournal(self.legacy_csv, repair=False)
+            journal.load(legacy)
+            journal.close()
+            self.rejected.extend(journal.rejected)
+        return legacy
+
+    @staticmethod
+    def _read_base(path: Path) -> int | None:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.loads(f.readline())['base']
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    @staticmethod
+    def _insert(store: HistoryStore, inserts: list[tuple[int, int, int, str]]):
+        if len(inserts) == 1:
+            store.insert(*inserts[0])
+        elif inserts:
+            store.insert_many(inserts)
+
+    @staticmethod
+    def _replay(store: HistoryStore, op: dict):
+        match op['op']:
+            case 'edit':
+                store.update_at(op['pos'], op['ts'], op['dur'], op['note'])
+            case 'del':
+                store.remove_at(op['pos'])
+            case 'clear':
+                store.clear()
+
+    @staticmethod
+    def _write_journal(path: Path, base: int, lines: list[str]):
+        """ 原子地写入一个新日志 """
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'base': base}) + '\n')
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        fsync_dir(path.parent)
+
+    def _write_snapshot_tmp(self, store: HistoryStore) -> int:
+        """ 把 store 写成临时快照文件，返回快照的 CRC32 """
+        with PROFILER.span('HistoryJournal.snapshot', rows=len(store)):
+            base = self.format.write(self._tmp_snapshot_file, store)
+        if PROFILER.enabled:
+            PROFILER.count('bytes_written', self._tmp_snapshot_file.stat().st_size)
+        return base
+
+    def _write_snapshot(self, store: HistoryStore) -> int:
+        base = self._write_snapshot_tmp(store)
+        os.replace(self._tmp_snapshot_file, self.snapshot_file)
+        fsync_dir(self.snapshot_file.parent)
+        return base
+
+    @contextmanager
+    def transaction(self):
+        """ 事务中的操作在结束时一起写入，只 fsync 一次；嵌套的事务并入最外层 """
+        if self._pending is not None:
+            yield
+            return
+        self._pending = []
+        try:
+            yield
+        finally:
+            lines, self._pending = self._pending, None
+            if lines:
+                self._write_lines(lines)
+
+    def _append(self, *ops: dict):
+        lines = [json.dumps(op, ensure_ascii=False) + '\n' for op in ops]
+        if self._pending is not None:
+            self._pending.extend(lines)
+        else:
+            self._write_lines(lines)
+
+    def _write_lines(self, lines: list[str]):
+        with self._lock, PROFILER.span('HistoryJournal.write', lines=len(lines)):
+            self._file.writelines(lines)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if PROFILER.enabled:
+                PROFILER.count('bytes_written', sum(len(line.encode('utf-8')) for line in lines))
+            self._ops += len(lines)
+            if self._tail is not None:
+                self._tail.extend(lines)
+
+    def records_added(self, records: list[tuple[int, Record]]):
+        """ 批量追加新增记录，只 fsync 一次 """
+        self._append(*(
+            {'op': 'add', 'pos': position, 'ts': record.timestamp, 'dur': record.duration, 'note': record.note}
+            for position, record in records
+        ))
+
+    def record_updated(self, position: int, record: Record):
+        self._append({'op': 'edit', 'pos': position, 'ts': record.timestamp, 'dur': record.duration, 'note': record.note})
+
+    def record_removed(self, position: int, record: Record):
+        self._append({'op': 'del', 'pos': position})
+
+    def cleared(self):
+        self._append({'op': 'clear'})
+
+    def maybe_compact(self, store: HistoryStore):
+        """ 日志过长时在后台压缩
+
+        调用方需要保证 store 的修改和对应的日志追加不会与这里交错，
+        store 的副本在调用线程中生成。
+        """
+        snapshot = self._begin_compaction(store, force=False)
+        if snapshot is not None:
+            self._compaction = threading.Thread(target=self._compact, args=(snapshot,), daemon=True)
+            self._compaction.start()
+
+    def compact(self, store: HistoryStore):
+        """ 立即在当前线程中压缩，不管日志有多长 """
+        if self._compaction is not None:
+            self._compaction.join()
+        snapshot = self._begin_compaction(store, force=True)
+        if snapshot is not None:
+            self._compact(snapshot)
+
+    def rewrite(self, store: HistoryStore):
+        """ 压缩本身就是把 store 写成新快照并换掉日志，写坏了的日志随之丢弃 """
+        self.compact(store)
+
+    def _begin_compaction(self, store: HistoryStore, force: bool) -> HistoryStore | None:
+        with self._lock:
+            if self._tail is not None or (not force and self._ops < self.COMPACT_THRESHOLD):
+                return None
+            self._tail = []
+            return store.copy()
+
+    def _compact(self, snapshot: HistoryStore):
+        try:
+            base = self._write_snapshot_tmp(snapshot)
+            with self._lock:
+                # 先写好新日志再替换快照，替换快照是提交点
+                with open(self._new_journal_file, 'w', encoding='utf-8') as f:
+                    f.write(json.dumps({'base': base}) + '\n')
+                    f.writelines(self._tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(self._tmp_snapshot_file, self.snapshot_file)
+                fsync_dir(self.snapshot_file.parent)
+                self._file.close()
+                os.replace(self._new_journal_file, self.journal_file)
+                fsync_dir(self.journal_file.parent)
+                self._file = open(self.journal_file, 'a', encoding='utf-8')
+                self._ops = len(self._tail)
+        finally:
+            with self._lock:
+                self._tail = None
+                if self._file.closed:
+                    self._file = open(self.journal_file, 'a', encoding='utf-8')
+
+    def close(self):
+        """ 等待后台压缩结束并关闭日志文件 """
+        if self._compaction is not None:
+            self._compaction.join()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
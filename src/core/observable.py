@@ -0,0 +1,114 @@
+import threading
+from contextlib import contextmanager
+from typing import Callable
+
+from core.events import coalesce
+
+
+class Observable:
+    """ 一个简单的观察者模式
+
+    `register_callback` 注册的回调不带参数，每次通知（或每个批次）只调用一次；
+    `subscribe` 按事件类型订阅，处理函数会收到事件对象，订阅基类可以收到所有子类事件。
+
+    两种订阅都可以指定 `deferred=True`：事件先排队，在下一帧（`FRAME_INTERVAL` 秒后）
+    统一合并投递，适合刷新界面这类开销较大的订阅者。
+    在 `with observable.batch():` 中发布的事件会在退出时合并成一次通知。
+
+    投递是串行的：同一时间只有一个线程在调用即时的订阅者，延迟的订阅者同理（两者互不等待），
+    所以订阅者不需要考虑自己被并发调用，收到事件的顺序就是投递的顺序。
+    """
+
+    FRAME_INTERVAL = 1 / 60
+
+    def __init__(self):
+        self._callbacks = []
+        self._handlers: dict[type, list[Callable]] = {}
+        self._deferred_callbacks = []
+        self._deferred_handlers: dict[type, list[Callable]] = {}
+        self._lock = threading.RLock()
+        self._dispatch_lock = threading.RLock()
+        self._deferred_lock = threading.RLock()
+        self._batch_depth = 0
+        self._batched_events = []
+        self._deferred_events = []
+        self._deferred_timer: threading.Timer | None = None
+
+    def register_callback(self, callback: Callable, deferred: bool = False):
+        (self._deferred_callbacks if deferred else self._callbacks).append(callback)
+
+    def unregister_callback(self, callback: Callable):
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+        else:
+            self._deferred_callbacks.remove(callback)
+
+    def subscribe(self, event_type: type, handler: Callable, deferred: bool = False):
+        handlers = self._deferred_handlers if deferred else self._handlers
+        handlers.setdefault(event_type, []).append(handler)
+
+    def unsubscribe(self, event_type: type, handler: Callable):
+        if handler in self._handlers.get(event_type, ()):
+            self._handlers[event_type].remove(handler)
+        else:
+            self._deferred_handlers[event_type].remove(handler)
+
+    def notify_callbacks(self):
+        for callback in self._callbacks:
+            callback()
+
+    def publish(self, event):
+        with self._lock:
+            if self._batch_depth:
+                self._batched_events.append(event)
+                return
+        self._dispatch([event])
+
+    @contextmanager
+    def batch(self):
+        """ 批次内发布的事件在最外层批次结束时合并后一次性投递 """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                events = [] if self._batch_depth else self._batched_events
+                if not self._batch_depth:
+                    self._batched_events = []
+            if events:
+                self._dispatch(coalesce(events))
+
+    @staticmethod
+    def _deliver(handlers: dict[type, list[Callable]], events: list):
+        for event in events:
+            for event_type in type(event).__mro__:
+                for handler in handlers.get(event_type, ()):
+                    handler(event)
+
+    def _dispatch(self, events: list):
+        with self._dispatch_lock:
+            self._deliver(self._handlers, events)
+            self.notify_callbacks()
+        if self._deferred_handlers or self._deferred_callbacks:
+            with self._lock:
+                self._deferred_events.extend(events)
+                if self._deferred_timer is None:
+                    self._deferred_timer = threading.Timer(self.FRAME_INTERVAL, self.flush_deferred)
+                    self._deferred_timer.daemon = True
+                    self._deferred_timer.start()
+
+    def flush_deferred(self):
+        """ 立即投递所有排队中的延迟事件 """
+        with self._deferred_lock:
+            with self._lock:
+                if self._deferred_timer is not None:
+                    self._deferred_timer.cancel()
+                    self._deferred_timer = None
+                events, self._deferred_events = coalesce(self._deferred_events), []
+            if not events:
+                return
+            self._deliver(self._deferred_handlers, events)
+            for callback in self._deferred_callbacks:
+                callback()
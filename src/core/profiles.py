@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Generic, TypeVar
+
+DEFAULT_PROFILE = '默认'
+CACHE_SIZE = 3
+
+T = TypeVar('T')
+
+
+class ProfileCache(Generic[T]):
+    """ 最近使用的若干个档案的已加载数据，超出容量时关闭最久没有使用的一个
+
+    `opener` 按档案名和数据目录加载数据（例如创建 HistoryRepository），`closer` 在淘汰时释放它。
+    切换回缓存中的档案不需要重新读取文件，内存中同时最多只有 `capacity` 份数据。
+    """
+
+    def __init__(self, opener: Callable[[str, Path], T], closer: Callable[[T], None], capacity: int = CACHE_SIZE):
+        self.opener = opener
+        self.closer = closer
+        self.capacity = max(1, capacity)
+        self._entries: OrderedDict[str, T] = OrderedDict()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def get(self, name: str, directory: Path) -> T:
+        if name in self._entries:
+            self._entries.move_to_end(name)
+            return self._entries[name]
+        entry = self._entries[name] = self.opener(name, directory)
+        while len(self._entries) > self.capacity:
+            _, evicted = self._entries.popitem(last=False)
+            self.closer(evicted)
+        return entry
+
+    def close(self):
+        while self._entries:
+            _, entry = self._entries.popitem()
+            self.closer(entry)
+
+
+class Profiles:
+    """ 多个命名的档案，每个档案是一个独立的数据目录
+
+    默认档案就是根目录本身，与只有一份历史记录时的文件位置相同；
+    其他档案放在 `根目录/profiles/档案名/` 下。上次使用的档案记在 `profiles.json` 中。
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.settings_file = root / 'profiles.json'
+
+    def names(self) -> list[str]:
+        directory = self.root / 'profiles'
+        others = sorted(path.name for path in directory.iterdir() if path.is_dir()) if directory.is_dir() else []
+        return [DEFAULT_PROFILE, *others]
+
+    def directory(self, name: str) -> Path:
+        if name == DEFAULT_PROFILE:
+            return self.root
+        if name not in self.names():
+            raise ValueError(f"档案不存在: {name}")
+        return self.root / 'profiles' / name
+
+    def create(self, name: str) -> Path:
+        name = name.strip()
+        if not name or name in ('.', '..') or any(char in name for char in '/\\:*?"<>|'):
+            raise ValueError("档案名不能为空，也不能包含特殊字符。")
+        if name in self.names():
+            raise ValueError(f"档案已存在: {name}")
+        directory = self.root / 'profiles' / name
+        directory.mkdir(parents=True)
+        return directory
+
+    @property
+    def current(self) -> str:
+        """ 上次使用的档案，已经不存在时回到默认档案 """
+        try:
+            name = json.loads(self.settings_file.read_text(encoding='utf-8'))['current']
+        except (OSError, ValueError, KeyError, TypeError):
+            return DEFAULT_PROFILE
+        return name if name in self.names() else DEFAULT_PROFILE
+
+    @current.setter
+    def current(self, name: str):
+        tmp = self.settings_file.with_suffix('.json.tmp')
+        tmp.write_text(json.dumps({'current': name}, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp, self.settings_file)
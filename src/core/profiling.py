@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Iterator
+
+MAX_EVENTS = 200_000
+
+
+class Profiler:
+    """ 热点路径的耗时区间和计数器，导出为 Chrome trace event 格式的 JSON
+
+    导出的文件可以直接用 chrome://tracing 或 https://ui.perfetto.dev 打开。
+    默认关闭，关闭时 `span` 和 `count` 几乎没有开销。环境变量 `DICK_HELPER_PROFILE`
+    设为 `1` 时记录区间和计数器，设为 `cprofile` 时还会用 cProfile 采集最外层区间内的函数调用，
+    导出时另存为同名的 `.prof` 文件（可以用 snakeviz 等工具查看）。设置页面中也可以开关。
+
+    事件保存在一个有上限的队列里，长时间运行只保留最近的 `MAX_EVENTS` 条。
+    cProfile 同一时间只能在一个线程中启用，其他线程中同时发生的区间只记录耗时。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.counters: dict[str, int] = {}
+        self._events: deque[dict] = deque(maxlen=MAX_EVENTS)
+        self._threads: dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._profile: cProfile.Profile | None = None
+        self._profile_lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+        self._pid = os.getpid()
+
+    @property
+    def cprofile(self) -> bool:
+        return self._profile is not None
+
+    def configure(self, enabled: bool, cprofile: bool = False):
+        """ 开关记录；重新开启 cProfile 会丢弃之前采集的调用数据 """
+        with self._profile_lock:
+            self.enabled = enabled
+            if not (enabled and cprofile):
+                self._profile = None
+            elif self._profile is None:
+                self._profile = cProfile.Profile()
+
+    def configure_from_env(self):
+        value = os.environ.get('DICK_HELPER_PROFILE', '').strip().lower()
+        self.configure(value not in ('', '0'), value == 'cprofile')
+
+    def _now(self) -> float:
+        """ 相对于开始记录时的微秒数 """
+        return (time.perf_counter_ns() - self._origin) / 1000
+
+    def _record(self, event: dict):
+        thread = threading.current_thread()
+        event['pid'] = self._pid
+        event['tid'] = thread.ident
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            self._events.append(event)
+
+    @contextmanager
+    def span(self, name: str, **args) -> Iterator[dict]:
+        """ 记录一段代码的耗时，`args` 会出现在 trace 中；产出的字典可以在区间内补充参数 """
+        if not self.enabled:
+            yield args
+            return
+        profile = self._profile
+        profiling = profile is not None and self._profile_lock.acquire(blocking=False)
+        start = self._now()
+        if profiling:
+            profile.enable()
+        try:
+            yield args
+        finally:
+            if profiling:
+                profile.disable()
+                self._profile_lock.release()
+            self._record({'name': name, 'ph': 'X', 'ts': start, 'dur': self._now() - start, 'args': args})
+
+    def count(self, name: str, value: int = 1):
+        """ 累加计数器，trace 中以计数曲线显示 """
+        if not self.enabled:
+            return
+        with self._lock:
+            total = self.counters[name] = self.counters.get(name, 0) + value
+        self._record({'name': name, 'ph': 'C', 'ts': self._now(), 'args': {name: total}})
+
+    def reset(self):
+        with self._lock:
+            self._events.clear()
+            self.counters.clear()
+
+    def export(self, directory: Path) -> Path:
+        """ 把目前记录的事件写到 `directory/profile-时间.json`，启用了 cProfile 时同时写 `.prof`，返回 JSON 的路径 """
+        path = directory / f"profile-{datetime.now():%Y%m%d-%H%M%S}.json"
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+            counters = dict(self.counters)
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in threads.items()
+        ]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'traceEvents': metadata + events,
+                'displayTimeUnit': 'ms',
+                'otherData': {'counters': counters}
+            }, f, ensure_ascii=False)
+        with self._profile_lock:
+            if self._profile is not None:
+                self._profile.dump_stats(path.with_suffix('.prof'))
+        return path
+
+
+PROFILER = Profiler()
+PROFILER.configure_from_env()
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """ 把整个函数调用记录为一个区间 """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with PROFILER.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
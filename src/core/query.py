@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Iterable, Iterator, Sequence
+
+from core.events import ChangeEvent
+from core.store import HistoryStore, Record
+
+
+class SortKey(Enum):
+    TIME = 'time'
+    DURATION = 'duration'
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """ 翻页位置：上一页最后一条记录的排序键和 id，中间插入或删除了记录也不会重复或跳过 """
+    key: tuple[int, ...]
+    record_id: int
+
+
+@dataclass(frozen=True)
+class Page:
+    records: list[Record]
+    cursor: Cursor | None  # 下一页从这里开始，没有更多记录时为 None
+
+
+class HistoryQuery:
+    """ 按时间或持续时间排序、分页读取历史记录
+
+    升序的定义是稳定的：按时间升序就是 store 倒过来（store 按时间从新到旧排列），
+    按持续时间升序时持续时间相同的记录按时间从新到旧排列；降序是升序整个倒过来。
+    按时间排序直接使用 store 本身的顺序；按持续时间的顺序在数据变化后第一次用到时重新排序。
+
+    `page` 用游标翻页，适合逐页读取；`rows` 按偏移读取，供界面在滚动时直接跳到某一行。
+    """
+
+    def __init__(self, store: HistoryStore):
+        self.store = store
+        self._by_duration: list[int] | None = None
+
+    def handle(self, event: ChangeEvent):
+        self._by_duration = None
+
+    def _order(self, sort: SortKey) -> Sequence[int]:
+        """ 升序排列的 store 位置 """
+        if sort is SortKey.TIME:
+            return range(len(self.store) - 1, -1, -1)
+        if self._by_duration is None:
+            self._by_duration = sorted(range(len(self.store)), key=self.store.durations.__getitem__)
+        return self._by_duration
+
+    def _key_func(self, sort: SortKey) -> Callable[[int], tuple[int, ...]]:
+        timestamps, durations = self.store.timestamps, self.store.durations
+        if sort is SortKey.TIME:
+            return lambda position: (timestamps[position],)
+        return lambda position: (durations[position], -timestamps[position])
+
+    def sort_positions(self, positions: Iterable[int], sort: SortKey, descending: bool) -> list[int]:
+        """ 把按 store 顺序排列的一组位置（例如搜索结果）按指定方式排序 """
+        if sort is SortKey.TIME:
+            return list(positions) if descending else list(reversed(list(positions)))
+        ordered = sorted(positions, key=self.store.durations.__getitem__)
+        return ordered[::-1] if descending else ordered
+
+    def _positions(self, order: Sequence[int], descending: bool, offset: int, limit: int) -> Sequence[int]:
+        if descending:
+            end = max(len(order) - offset, 0)
+            return order[max(end - limit, 0):end][::-1]
+        return order[offset:offset + limit]
+
+    def rows(self, sort: SortKey, descending: bool, offset: int, limit: int) -> list[Record]:
+        return [self.store.at(position) for position in self._positions(self._order(sort), descending, offset, limit)]
+
+    def _locate(self, sort: SortKey, order: Sequence[int], cursor: Cursor) -> tuple[int, int]:
+        """ 游标在升序序列中的位置，返回 (游标之前的条数, 游标之后第一条的序号)
+
+        游标指向的记录已经被删除时，跳过排序键与它相同的全部记录。
+        """
+        key = self._key_func(sort)
+        low = bisect_left(order, cursor.key, key=key)
+        high = bisect_right(order, cursor.key, lo=low, key=key)
+        ids = self.store.ids
+        for index in range(low, high):
+            if ids[order[index]] == cursor.record_id:
+                return index, index + 1
+        return low, high
+
+    def page(
+        self,
+        sort: SortKey = SortKey.TIME,
+        descending: bool = True,
+        after: Cursor | None = None,
+        limit: int = 50
+    ) -> Page:
+        """ 读取游标之后的一页，`after` 为 None 时从第一条开始 """
+        order = self._order(sort)
+        offset = 0
+        if after is not None:
+            before, following = self._locate(sort, order, after)
+            offset = len(order) - before if descending else following
+        positions = self._positions(order, descending, offset, limit)
+        records = [self.store.at(position) for position in positions]
+        if not records or offset + len(records) >= len(order):
+            return Page(records, None)
+        return Page(records, Cursor(self._key_func(sort)(positions[-1]), records[-1].id))
+
+    def pages(
+        self,
+        sort: SortKey = SortKey.TIME,
+        descending: bool = True,
+        limit: int = 50,
+        lock: AbstractContextManager | None = None
+    ) -> Iterator[list[Record]]:
+        """ 逐页产出全部记录，每一页在 `lock` 内读取，页与页之间数据可以被修改 """
+        cursor = None
+        while True:
+            with lock or nullcontext():
+                page = self.page(sort, descending, cursor, limit)
+            if page.records:
+                yield page.records
+            if page.cursor is None:
+                return
+            cursor = page.cursor
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Sequence
+
+from core.backend import StorageBackend
+from core.events import HistoryCleared, HistoryReplaced, RecordRemoved, RecordsAdded, RecordUpdated
+from core.export import CHUNK_SIZE, ExportProgress, HistoryExport
+from core.importer import CsvImport, ImportProgress, MergeIndex, MergePolicy, MergeReport
+from core.observable import Observable
+from core.profiling import PROFILER
+from core.query import HistoryQuery, SortKey
+from core.storage import open_backend
+from core.store import HistoryStore, Record
+from core.writer import WriteBehindBackend, WritePolicy
+
+
+class HistoryRepository(Observable):
+    """ 历史记录的读写入口，与界面无关
+
+    持有内存中的 HistoryStore 和持久化后端，所有修改都经过这里：
+    先改 store，再交给后端持久化，最后发布对应的变化事件。
+    事件在持有 `lock` 时发布，导入线程和界面线程同时修改时，订阅者也按修改的先后收到事件。
+    界面（HistoryPage、StatsView）和命令行工具都只通过它访问数据。
+
+    store 中的记录始终按时间从新到旧排列，时间相同时后添加的在前：添加时二分查找插入位置，导入时整批归并，
+    修改了时间的记录视为新添加，移动到时间相同的记录之前。旧版本按添加顺序保存的数据在加载时排序一次并压缩。
+
+    加载时无法解析而被跳过的行见 `rejected`，它们已经另存到 `backend.rejected_file`。
+
+    `write_behind=True` 时后端的写入在后台线程中按 `write_policy` 合并进行（见 `WriteBehindBackend`），
+    修改方法不会等待磁盘；`flush` 立即写入，写入失败时调用 `on_write_error`。
+
+    后端写入失败时 store 已经改了，而后端按位置记录操作，之后的写入都会错位，
+    所以出错后立即用 `backend.rewrite` 按 store 整个重写存储再抛出异常；
+    重写也失败时拒绝之后的修改（抛出同样的错误），直到某次重写成功。
+    """
+
+    def __init__(
+        self,
+        work_dir: Path,
+        backend: StorageBackend | None = None,
+        write_behind: bool = False,
+        write_policy: WritePolicy | None = None
+    ):
+        super().__init__()
+        self.work_dir = work_dir
+        self.store = HistoryStore()
+        # store 的修改与后端的写入必须成对进行，读取方也不能读到修改了一半的数据
+        self.lock = threading.RLock()
+        self.on_write_error: Callable[[Exception], None] | None = None
+        self._diverged = False  # 后端写入失败且还没有重写成功
+        self.backend = backend or open_backend(work_dir)
+        if write_behind:
+            self.backend = WriteBehindBackend(self.backend, self.lock, self._write_failed, write_policy or WritePolicy.from_env())
+        self.backend.load(self.store)
+        if not self.store.is_sorted():
+            self.store.sort()
+            self.backend.compact(self.store)
+
+    @property
+    def rejected(self) -> Sequence[list[str]]:
+        return self.backend.rejected
+
+    def _write_failed(self, error: Exception):
+        if self.on_write_error is not None:
+            self.on_write_error(error)
+
+    @contextmanager
+    def _writing(self):
+        """ 包住 store 的修改和对应的后端写入，调用方持有锁
+
+        出错时 store 可能已经改了却没有发布事件，所以在重写存储之后发布 HistoryReplaced，
+        让订阅者从 store 重新构建。
+        """
+        if self._diverged:
+            self.backend.rewrite(self.store)
+            self._diverged = False
+        try:
+            yield
+        except Exception:
+            self._diverged = True
+            try:
+                self.backend.rewrite(self.store)
+                self._diverged = False
+            except Exception:
+                pass  # 抛出原来的错误，下次修改前再试
+            self.publish(HistoryReplaced())
+            raise
+
+    def add(self, timestamp: int, duration: int, note: str | None = None) -> Record:
+        """ 按时间添加一条记录 """
+        with self.lock:
+            with self._writing():
+                position = self.store.insertion_point(timestamp)
+                self.store.insert(position, timestamp, duration, note)
+                record = self.store.at(position)
+                self.backend.record_added(position, record)
+            self.backend.maybe_compact(self.store)
+            self.publish(RecordsAdded((record,)))
+        return record
+
+    def extend(self, rows: list[tuple[int, int, str]]) -> tuple[Record, ...]:
+        """ 把一批数据按时间归并到各自的位置，一批数据由后端一次写入，返回的记录按位置排列 """
+        with self.lock:
+            with self._writing():
+                added = [(position, self.store.at(position)) for position in self.store.merge(rows)]
+                self.backend.records_added(added)
+            self.backend.maybe_compact(self.store)
+            records = tuple(record for _, record in added)
+            self.publish(RecordsAdded(records))
+        return records
+
+    def _update(self, position: int, timestamp: int, duration: int, note: str | None) -> tuple[Record, Record]:
+        """ 修改 `position` 处的记录并交给后端，返回 (修改前, 修改后)；调用方持有锁 """
+        store = self.store
+        if store.timestamps[position] == timestamp:
+            old = store.update_at(position, timestamp, duration, note)
+            record = store.at(position)
+            self.backend.record_updated(position, record)
+        else:
+            old = store.remove_at(position)
+            new_position = store.insertion_point(timestamp)
+            store.insert(new_position, timestamp, duration, note, record_id=old.id)
+            record = store.at(new_position)
+            with self.backend.transaction():
+                self.backend.record_removed(position, old)
+                self.backend.record_added(new_position, record)
+        return old, record
+
+    def update(self, record_id: int, timestamp: int, duration: int, note: str | None = None) -> Record:
+        """ 修改一条记录，时间变了时把它移动到新的位置（排在时间相同的记录之前），id 不变 """
+        with self.lock:
+            position = self.store.position(record_id)
+            with self._writing():
+                old, record = self._update(position, timestamp, duration, note)
+            self.backend.maybe_compact(self.store)
+            self.publish(RecordUpdated(old, record))
+        return record
+
+    def update_many(self, updates: list[tuple[int, tuple[int, int, str]]]) -> list[Record]:
+        """ 批量修改，已经不存在的记录会被忽略
+
+        全部修改在后端的一个事务中写入，所有变化合并为一次通知。记录先在与新时间相同的记录中查找，
+        导入覆盖时时间不变，每条都是 O(log n)。
+        """
+        changes = []
+        with self.lock:
+            with self._writing(), self.backend.transaction():
+                for record_id, (timestamp, duration, note) in updates:
+                    try:
+                        position = self.store.position(record_id, timestamp)
+                    except ValueError:
+                        continue
+                    changes.append(self._update(position, timestamp, duration, note))
+            self.backend.maybe_compact(self.store)
+            with self.batch():
+                for old, record in changes:
+                    self.publish(RecordUpdated(old, record))
+        return [record for _, record in changes]
+
+    def remove(self, record_id: int) -> Record:
+        with self.lock:
+            position = self.store.position(record_id)
+            with self._writing():
+                record = self.store.remove_at(position)
+                self.backend.record_removed(position, record)
+            self.backend.maybe_compact(self.store)
+            self.publish(RecordRemoved(record))
+        return record
+
+    def clear(self):
+        with self.lock:
+            with self._writing():
+                self.store.clear()
+                self.backend.cleared()
+            self.publish(HistoryCleared())
+
+    def import_csv(
+        self,
+        job: CsvImport,
+        policy: MergePolicy = MergePolicy.SKIP,
+        on_progress: Callable[[ImportProgress], None] | None = None
+    ) -> MergeReport:
+        """ 逐批导入并去重，每批提交一次；取消或出错时已提交的批次保留 """
+        with self.lock:
+            index = MergeIndex(self.store, policy)
+        for rows, progress in job:
+            with PROFILER.span('HistoryRepository.import_batch', rows=len(rows)):
+                to_add, to_update = index.merge(rows)
+                index.added(self.extend(to_add))
+                self.update_many(to_update)
+            if on_progress is not None:
+                on_progress(progress)
+        return index.report
+
+    def export(self, job: HistoryExport, on_progress: Callable[[ExportProgress], None] | None = None) -> int:
+        """ 按时间从新到旧流式导出，返回导出的记录数
+
+        每批记录用游标在锁内读出，批与批之间不持有锁，导出期间界面仍然可以修改数据，
+        已经导出的记录不会因为前面插入或删除了记录而重复或遗漏。
+        """
+        chunks = HistoryQuery(self.store).pages(SortKey.TIME, descending=True, limit=CHUNK_SIZE, lock=self.lock)
+        with PROFILER.span('HistoryRepository.export', format=job.format, compression=job.compression) as args:
+            args['rows'] = job.run(chunks, len(self.store), on_progress)
+        return job.rows
+
+    def export_csv(self, path: Path | str):
+        self.export(HistoryExport(Path(path)))
+
+    def count_between(self, start: int, end: int) -> int:
+        """ 时间戳在 [start, end) 内的记录数，由后端决定怎样查询 """
+        with self.lock:
+            return self.backend.count_between(start, end)
+
+    def records_between(self, start: int, end: int) -> list[Record]:
+        """ 时间戳在 [start, end) 内的记录，按时间从旧到新排列 """
+        with self.lock:
+            return self.backend.records_between(start, end)
+
+    def page(self, offset: int, limit: int) -> list[Record]:
+        """ 按时间从新到旧跳过 `offset` 条后最多取 `limit` 条 """
+        with self.lock:
+            return self.backend.page(offset, limit)
+
+    def flush(self):
+        """ 把还在排队的修改立即写入存储 """
+        if isinstance(self.backend, WriteBehindBackend):
+            self.backend.flush()
+
+    def compact(self):
+        with self.lock:
+            self.backend.compact(self.store)
+
+    def close(self):
+        self.flush_deferred()
+        self.backend.close()
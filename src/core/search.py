@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from itertools import compress, islice
+
+from core.events import ChangeEvent, HistoryReplaced, RecordRemoved, RecordsAdded, RecordUpdated
+from core.store import HistoryStore
+
+
+def grams(text: str) -> set[str]:
+    """ 文本中所有的单字和相邻两字，中文没有空格分词，按字符 n-gram 建索引 """
+    text = text.casefold()
+    return {*text, *(text[i:i + 2] for i in range(len(text) - 1))} - {' '}
+
+
+@dataclass(frozen=True)
+class SearchQuery:
+    """ 搜索条件，各项之间是“且”的关系，未设置的项不参与过滤
+
+    `text` 按空白分成多个词，每个词都要出现在备注中（不区分大小写）；
+    时间范围为 [start, end)，持续时间范围为 [min_duration, max_duration]，单位都是秒。
+    """
+    text: str = ''
+    start: int | None = None
+    end: int | None = None
+    min_duration: int | None = None
+    max_duration: int | None = None
+
+    @property
+    def terms(self) -> list[str]:
+        return self.text.casefold().split()
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.terms and self.start is None and self.end is None \
+            and self.min_duration is None and self.max_duration is None
+
+
+class NoteIndex:
+    """ 备注的倒排索引，随变化事件增量维护
+
+    备注大量重复，所以索引建在去重后的备注上：n-gram -> 含有它的备注，备注 -> 使用它的记录 id。
+    查询时先用 n-gram 求交集得到候选备注，再逐个确认子串，最后合并这些备注的记录 id。
+    事件处理和查询都在 `_lock` 内进行。
+    """
+
+    def __init__(self, store: HistoryStore):
+        self.store = store
+        self._lock = threading.Lock()
+        self.rebuild()
+
+    def rebuild(self):
+        self.postings: defaultdict[str, set[str]] = defaultdict(set)
+        self.note_ids: defaultdict[str, set[int]] = defaultdict(set)
+        for record_id, note in zip(self.store.ids, self.store.notes):
+            self._add(record_id, note)
+
+    def _add(self, record_id: int, note: str):
+        if not note:
+            return
+        ids = self.note_ids[note]
+        if not ids:
+            for gram in grams(note):
+                self.postings[gram].add(note)
+        ids.add(record_id)
+
+    def _remove(self, record_id: int, note: str):
+        ids = self.note_ids.get(note)
+        if not ids:
+            return
+        ids.discard(record_id)
+        if ids:
+            return
+        del self.note_ids[note]
+        for gram in grams(note):
+            notes = self.postings[gram]
+            notes.discard(note)
+            if not notes:
+                del self.postings[gram]
+
+    def handle(self, event: ChangeEvent):
+        with self._lock:
+            match event:
+                case RecordsAdded(records=records):
+                    for record in records:
+                        self._add(record.id, record.note)
+                case RecordUpdated(old=old, new=new):
+                    self._remove(old.id, old.note)
+                    self._add(new.id, new.note)
+                case RecordRemoved(record=record):
+                    self._remove(record.id, record.note)
+                case HistoryReplaced():
+                    self.rebuild()
+
+    def _notes_containing(self, term: str) -> set[str]:
+        term_grams = grams(term) if len(term) == 1 else {term[i:i + 2] for i in range(len(term) - 1)}
+        postings = sorted((self.postings.get(gram, set()) for gram in term_grams), key=len)
+        if not postings:
+            return set()
+        candidates = set(postings[0]).intersection(*postings[1:])
+        if len(term) <= 2:
+            return candidates
+        return {note for note in candidates if term in note.casefold()}
+
+    def search(self, terms: list[str]) -> set[int]:
+        """ 备注中包含所有词的记录 id """
+        with self._lock:
+            notes: set[str] | None = None
+            for term in sorted(terms, key=len, reverse=True):
+                found = self._notes_containing(term)
+                notes = found if notes is None else notes & found
+                if not notes:
+                    return set()
+            return set().union(*(self.note_ids[note] for note in notes or ()))
+
+
+class HistorySearch:
+    """ 按备注、时间和持续时间过滤历史记录，结果是 store 中的位置，顺序与 store 相同
+
+    时间范围在有序的 store 上二分查找，备注和持续时间只在这段位置内过滤。
+    """
+
+    def __init__(self, store: HistoryStore):
+        self.store = store
+        self.notes = NoteIndex(store)
+
+    def handle(self, event: ChangeEvent):
+        self.notes.handle(event)
+
+    def positions(self, query: SearchQuery) -> list[int]:
+        store = self.store
+        # store 按时间从新到旧排序，时间范围直接二分成一段连续的位置
+        first = store.insertion_point(query.end - 1) if query.end is not None else 0
+        last = store.insertion_point(query.start - 1) if query.start is not None else len(store)
+        positions: range | list[int] = range(first, max(first, last))
+        if query.terms:
+            ids = self.notes.search(query.terms)
+            if not ids:
+                return []
+            positions = list(compress(positions, map(ids.__contains__, islice(store.ids, first, last))))
+        if query.min_duration is not None or query.max_duration is not None:
+            low = query.min_duration if query.min_duration is not None else 0
+            high = query.max_duration if query.max_duration is not None else 2 ** 63 - 1
+            durations = store.durations
+            positions = [position for position in positions if low <= durations[position] <= high]
+        return list(positions)
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+
+NOTE_SIZE = 1024  # 草稿备注按 UTF-8 最多保存的字节数
+
+
+@dataclass(frozen=True)
+class SessionState:
+    """ 进行中的计时
+
+    时间都是墙上时间（time.time()），因为单调时钟在重启后没有意义。
+    `elapsed` 是保存检查点时已经累计的秒数（不含暂停的时间），
+    `checkpoint_at` 是保存检查点的时刻，恢复时用它推算检查点之后又过了多久。
+    """
+    started_at: float
+    checkpoint_at: float
+    elapsed: float
+    paused: bool
+    note: str
+
+
+class SessionCheckpoint:
+    """ 用一个固定长度的记录保存进行中的计时
+
+    每次保存都在文件开头原地覆盖写入同样长度的数据，不 fsync，
+    代价与历史记录的多少无关，可以频繁调用；应用被杀掉时数据仍在系统缓存中。
+    记录末尾有 CRC32，写到一半的记录会被当作不存在。
+    """
+
+    MAGIC = b'DHSS'
+    VERSION = 1
+    _STRUCT = struct.Struct(f'<4sHH?3xdddH{NOTE_SIZE}s')
+    _CRC = struct.Struct('<I')
+    SIZE = _STRUCT.size + _CRC.size
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: int | None = None
+
+    def _write(self, data: bytes):
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, data)
+
+    def save(self, state: SessionState):
+        note = state.note.encode('utf-8')[:NOTE_SIZE]
+        # 截断可能切开一个多字节字符，去掉不完整的部分
+        note = note.decode('utf-8', 'ignore').encode('utf-8')
+        data = self._STRUCT.pack(
+            self.MAGIC, self.VERSION, 1, state.paused,
+            state.started_at, state.checkpoint_at, state.elapsed, len(note), note
+        )
+        self._write(data + self._CRC.pack(zlib.crc32(data)))
+
+    def clear(self):
+        """ 标记没有进行中的计时，文件大小保持不变 """
+        data = self._STRUCT.pack(self.MAGIC, self.VERSION, 0, False, 0, 0, 0, 0, b'')
+        self._write(data + self._CRC.pack(zlib.crc32(data)))
+
+    def load(self) -> SessionState | None:
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read(self.SIZE)
+        except FileNotFoundError:
+            return None
+        if len(raw) != self.SIZE:
+            return None
+        data, (crc,) = raw[:self._STRUCT.size], self._CRC.unpack(raw[self._STRUCT.size:])
+        if zlib.crc32(data) != crc:
+            return None
+        magic, version, active, paused, started_at, checkpoint_at, elapsed, note_len, note = self._STRUCT.unpack(data)
+        if magic != self.MAGIC or version != self.VERSION or not active:
+            return None
+        return SessionState(started_at, checkpoint_at, elapsed, paused, note[:note_len].decode('utf-8'))
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
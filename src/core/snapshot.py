@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import csv
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from pathlib import Path
+
+from core.store import HEADER, HistoryStore, read_rows
+
+
+class _CrcWriter:
+    """ 写入文件的同时计算 CRC32，供 csv.writer 使用 """
+
+    def __init__(self, f):
+        self.f = f
+        self.crc = 0
+
+    def write(self, s: str):
+        data = s.encode('utf-8')
+        self.crc = zlib.crc32(data, self.crc)
+        self.f.write(data)
+
+
+class CsvSnapshot:
+    """ 文本快照，与导出的 CSV 格式相同；快照的 CRC32 按整个文件计算 """
+
+    journal_suffix = '.journal'
+
+    @staticmethod
+    def load(path: Path, store: HistoryStore, rejected: list[list[str]]) -> int:
+        """ 无法解析的行放进 `rejected`，其余的行照常读入 """
+        data = path.read_bytes()
+        store.extend(read_rows(data, rejected))
+        return zlib.crc32(data)
+
+    @staticmethod
+    def write(path: Path, store: HistoryStore) -> int:
+        with open(path, 'wb') as f:
+            writer = _CrcWriter(f)
+            csv_writer = csv.writer(writer)
+            csv_writer.writerow(HEADER)
+            csv_writer.writerows(store.rows())
+            f.flush()
+            os.fsync(f.fileno())
+        return writer.crc
+
+
+class BinarySnapshot:
+    """ 定长列式的二进制快照，启动时通过 mmap 整列读入，不需要逐行解析文本
+
+    文件布局（小端）：
+        头部 32 字节：magic、版本、保留字段、记录数、字符串堆长度、数据部分的 CRC32
+        时间戳列：记录数 × int64
+        持续时间列：记录数 × int64
+        备注序号列：记录数 × uint32，指向字符串堆中的第几条备注
+        字符串堆：去重后的备注，UTF-8 编码，以 NUL 分隔
+    """
+
+    journal_suffix = '.bin.journal'
+    MAGIC = b'DHBS'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHHQQI4x')
+
+    @classmethod
+    def load(cls, path: Path, store: HistoryStore, rejected: list[list[str]]) -> int:
+        """ 整列读入，不存在单独无法解析的行，`rejected` 只是为了与 CsvSnapshot 接口一致 """
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if len(mm) < cls.HEADER.size:
+                raise ValueError("快照文件已损坏。")
+            magic, version, _, count, heap_size, crc = cls.HEADER.unpack_from(mm)
+            if magic != cls.MAGIC or version != cls.VERSION:
+                raise ValueError("快照文件格式不正确。")
+            columns_end = cls.HEADER.size + count * 20
+            if len(mm) != columns_end + heap_size:
+                raise ValueError("快照文件已损坏。")
+            with memoryview(mm) as view:
+                payload = view[cls.HEADER.size:]
+                valid = zlib.crc32(payload) == crc
+                payload.release()
+            if not valid:
+                raise ValueError("快照文件已损坏。")
+
+            offset = cls.HEADER.size
+            timestamps = array('q', mm[offset:offset + count * 8])
+            durations = array('q', mm[offset + count * 8:offset + count * 16])
+            note_index = array('I', mm[offset + count * 16:columns_end])
+            note_table = mm[columns_end:].decode('utf-8').split('\0')
+        if sys.byteorder == 'big':
+            for column in (timestamps, durations, note_index):
+                column.byteswap()
+        store.extend_columns(timestamps, durations, note_table, note_index)
+        return crc
+
+    @classmethod
+    def write(cls, path: Path, store: HistoryStore) -> int:
+        table: dict[str, int] = {}
+        note_index = array('I', (table.setdefault(note, len(table)) for note in store.notes))
+        heap = '\0'.join(note.replace('\0', '') for note in table).encode('utf-8')
+        columns = [array('q', store.timestamps), array('q', store.durations), note_index]
+        if sys.byteorder == 'big':
+            for column in columns:
+                column.byteswap()
+
+        crc = 0
+        for column in columns:
+            crc = zlib.crc32(column, crc)
+        crc = zlib.crc32(heap, crc)
+        with open(path, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, 0, len(store), len(heap), crc))
+            for column in columns:
+                column.tofile(f)
+            f.write(heap)
+            f.flush()
+            os.fsync(f.fileno())
+        return crc
+
+
+SNAPSHOT_FORMATS = {
+    '.csv': CsvSnapshot,
+    '.bin': BinarySnapshot,
+}
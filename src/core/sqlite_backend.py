@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from core.backend import StorageBackend
+from core.journal import HistoryJournal
+from core.store import HistoryStore, Record, save_rejected
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    ord INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    note TEXT NOT NULL DEFAULT ''
+);
+DROP INDEX IF EXISTS idx_history_ts;
+CREATE INDEX IF NOT EXISTS idx_history_ts_ord ON history (ts, ord);
+CREATE INDEX IF NOT EXISTS idx_history_ord ON history (ord);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+'''
+
+_INSERT = 'INSERT INTO history (id, ord, ts, duration, note) VALUES (?, ?, ?, ?, ?)'
+_UPDATE = 'UPDATE history SET ts = ?, duration = ?, note = ? WHERE id = ?'
+_DELETE = 'DELETE FROM history WHERE id = ?'
+_COUNT_BETWEEN = 'SELECT COUNT(*) FROM history WHERE ts >= ? AND ts < ?'
+_SELECT_BETWEEN = 'SELECT id, ts, duration, note FROM history WHERE ts >= ? AND ts < ? ORDER BY ts, ord'
+_SELECT_PAGE = 'SELECT id, ts, duration, note FROM history ORDER BY ts DESC, ord DESC LIMIT ? OFFSET ?'
+_SELECT_ALL = 'SELECT id, ts, duration, note FROM history ORDER BY ts DESC, ord DESC'
+
+
+class SqliteBackend(StorageBackend):
+    """ 基于 SQLite 的持久化
+
+    使用 WAL 模式，`(ts, ord)` 上有索引，加载、时间范围和分页查询都直接按索引顺序读出，不需要临时排序。
+    记录按时间从新到旧读出，时间相同时 `ord` 大的在前。`ord` 在每次插入时递增（修改时间的记录会被删除后重新插入），
+    一批记录中位置靠前的 `ord` 更大，所以读出的顺序与 store 中的顺序一致。
+    第一次打开时，如果存在旧的快照（`history.bin` 或 `history.csv`，及其日志），会把其中的数据一次性迁移进来。
+    """
+
+    def __init__(self, db_file: Path, legacy_snapshot: Path | None = None):
+        self.db_file = db_file
+        self.legacy_snapshot = legacy_snapshot
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.RLock()
+        self._in_transaction = False
+        self._max_ord: int | None = None
+        self.rejected: list[list[str]] = []
+        self.rejected_file = db_file.with_suffix(db_file.suffix + '.rejected')
+
+    def load(self, store: HistoryStore):
+        self.store = store
+        # 连接会在 Flet 的事件处理线程之间共享，由 self._lock 串行化
+        self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        if self.legacy_snapshot is not None and self.legacy_snapshot.exists() and self._get_meta('migrated_from') is None:
+            self._migrate(self.legacy_snapshot)
+
+        self._max_ord = self._conn.execute('SELECT MAX(ord) FROM history').fetchone()[0]
+        for record_id, timestamp, duration, note in self._conn.execute(_SELECT_ALL):
+            store.append(timestamp, duration, note, record_id=record_id)
+
+    def _get_meta(self, key: str) -> str | None:
+        row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _migrate(self, snapshot_file: Path):
+        """ 把快照和日志中的数据一次性导入数据库 """
+        legacy = HistoryStore()
+        journal = HistoryJournal(snapshot_file, repair=False)
+        journal.load(legacy)
+        journal.close()
+        if not legacy.is_sorted():
+            legacy.sort()
+        if journal.rejected:
+            self.rejected = journal.rejected
+            save_rejected(self.rejected_file, self.rejected)
+        with self._conn:
+            self._conn.executemany(_INSERT, (
+                (None, len(legacy) - 1 - position, record.timestamp, record.duration, record.note)
+                for position, record in enumerate(legacy)
+            ))
+            self._conn.execute('INSERT INTO meta (key, value) VALUES (?, ?)', ('migrated_from', str(snapshot_file)))
+
+    def _next_ord(self) -> int:
+        self._max_ord = 0 if self._max_ord is None else self._max_ord + 1
+        return self._max_ord
+
+    @contextmanager
+    def transaction(self):
+        """ 事务中的写入在结束时一起提交；嵌套的事务并入最外层 """
+        if self._in_transaction:
+            yield
+            return
+        with self._lock, self._conn:
+            self._in_transaction = True
+            try:
+                yield
+            finally:
+                self._in_transaction = False
+
+    @contextmanager
+    def _writing(self):
+        with self._lock:
+            if self._in_transaction:
+                yield
+            else:
+                with self._conn:
+                    yield
+
+    def records_added(self, records: list[tuple[int, Record]]):
+        with self._writing():
+            # 倒着分配 ord，时间相同时位置靠前的排在前面
+            self._conn.executemany(_INSERT, [
+                (record.id, self._next_ord(), record.timestamp, record.duration, record.note)
+                for position, record in reversed(records)
+            ])
+
+    def record_updated(self, position: int, record: Record):
+        with self._writing():
+            self._conn.execute(_UPDATE, (record.timestamp, record.duration, record.note, record.id))
+
+    def record_removed(self, position: int, record: Record):
+        with self._writing():
+            self._conn.execute(_DELETE, (record.id,))
+
+    def cleared(self):
+        with self._writing():
+            self._conn.execute('DELETE FROM history')
+            self._max_ord = None
+
+    def rewrite(self, store: HistoryStore):
+        """ 在一个事务中清空数据库并写入 store 中的全部记录，ord 按位置倒序分配 """
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM history')
+            self._conn.executemany(_INSERT, (
+                (record.id, len(store) - 1 - position, record.timestamp, record.duration, record.note)
+                for position, record in enumerate(store)
+            ))
+            self._max_ord = len(store) - 1 if len(store) else None
+
+    def compact(self, store: HistoryStore):
+        """ 把 WAL 合并回数据库文件并回收空间 """
+        with self._lock:
+            self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            self._conn.execute('VACUUM')
+
+    def count_between(self, start: int, end: int) -> int:
+        with self._lock:
+            return self._conn.execute(_COUNT_BETWEEN, (start, end)).fetchone()[0]
+
+    def records_between(self, start: int, end: int) -> list[Record]:
+        with self._lock:
+            return [Record(*row) for row in self._conn.execute(_SELECT_BETWEEN, (start, end))]
+
+    def page(self, offset: int, limit: int) -> list[Record]:
+        with self._lock:
+            return [Record(*row) for row in self._conn.execute(_SELECT_PAGE, (limit, offset))]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute('PRAGMA optimize')
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime
+
+from core.events import ChangeEvent, HistoryReplaced, RecordRemoved, RecordsAdded, RecordUpdated
+from core.index import DateIndex, month_key, week_key
+from core.store import HistoryStore
+
+
+class HistoryStats:
+    """ 增量维护的统计数据
+
+    总次数和总时长在每次增删改时以 O(1) 更新，按周、按月和任意时间范围的次数由 `DateIndex` 回答，
+    只有调用 `rebuild` 时才会重新扫描整个 store。
+    本周、本月的次数直接从桶中读取，日历周期切换时只需换一个键，不需要重新统计。
+    事件处理和读取都在 `_lock` 内进行，界面线程读到的总次数和总时长总是一致的。
+    """
+
+    def __init__(self, store: HistoryStore):
+        self.store = store
+        self._lock = threading.RLock()
+        self.rebuild()
+
+    def rebuild(self):
+        with self._lock:
+            self.total_times = len(self.store)
+            self.total_duration = sum(self.store.durations)
+            self.index = DateIndex(self.store)
+            self.period = self.current_period()
+
+    def _count(self, duration: int, sign: int):
+        self.total_times += sign
+        self.total_duration += sign * duration
+
+    def handle(self, event: ChangeEvent):
+        with self._lock:
+            match event:
+                case RecordsAdded(records=records):
+                    for record in records:
+                        self._count(record.duration, 1)
+                case RecordUpdated(old=old, new=new):
+                    self._count(old.duration, -1)
+                    self._count(new.duration, 1)
+                case RecordRemoved(record=record):
+                    self._count(record.duration, -1)
+                case HistoryReplaced():
+                    self.rebuild()
+                    return
+            self.index.handle(event)
+
+    @staticmethod
+    def current_period() -> tuple[tuple[int, int], tuple[int, int]]:
+        now = datetime.now()
+        return week_key(now), month_key(now)
+
+    def roll_period(self) -> bool:
+        """ 检查日历周期是否已经切换，切换了返回 True """
+        period = self.current_period()
+        with self._lock:
+            if period == self.period:
+                return False
+            self.period = period
+            return True
+
+    @property
+    def avg_minute(self) -> float:
+        with self._lock:
+            if not self.total_times:
+                return 0
+            return round(self.total_duration / 60 / self.total_times, 2)
+
+    @property
+    def this_week_times(self) -> int:
+        with self._lock:
+            return self.index.week_count(self.period[0])
+
+    @property
+    def this_month_times(self) -> int:
+        with self._lock:
+            return self.index.month_count(self.period[1])
+
+    def count_between(self, start: int, end: int) -> int:
+        """ 时间戳在 [start, end) 内的次数 """
+        return self.index.count_between(start, end)
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from core.backend import StorageBackend
+from core.journal import HistoryJournal
+
+
+def open_backend(work_dir: Path, kind: str | None = None) -> StorageBackend:
+    """ 按名称创建持久化后端
+
+    `kind` 为 'binary'、'csv' 或 'sqlite'，未指定时读取环境变量 `DICK_HELPER_STORAGE`；
+    都没有指定时，已经存在 `history.db` 就继续使用 SQLite，否则使用二进制快照。
+    第一次使用二进制快照或 SQLite 时，已有的 `history.csv` 中的数据会被迁移过去，原文件保留。
+    """
+    db_file = work_dir / 'history.db'
+    bin_file = work_dir / 'history.bin'
+    csv_file = work_dir / 'history.csv'
+    kind = kind or os.environ.get('DICK_HELPER_STORAGE') or ('sqlite' if db_file.exists() else 'binary')
+    match kind:
+        case 'sqlite':
+            # sqlite3 只在使用 SQLite 后端时才导入，其他用户不必付出这部分启动时间
+            from core.sqlite_backend import SqliteBackend
+            return SqliteBackend(db_file, legacy_snapshot=bin_file if bin_file.exists() else csv_file)
+        case 'binary':
+            return HistoryJournal(bin_file, legacy_csv=csv_file)
+        case 'csv':
+            return HistoryJournal(csv_file)
+        case _:
+            raise ValueError(f"未知的存储类型: {kind}")
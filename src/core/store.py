@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import calendar
+import csv
+import io
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from operator import neg
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+HEADER = ['date_time', 'minute', 'second', 'note']
+DATE_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_timestamp(date_time: datetime) -> int:
+    """ 把 datetime 转换成时间戳（按墙上时间计算，不涉及时区） """
+    return calendar.timegm(date_time.timetuple())
+
+
+def parse_date_time(date_time: str) -> int:
+    """ 把 `YYYY-MM-DD HH:MM:SS` 解析成时间戳 """
+    return to_timestamp(datetime.strptime(date_time.strip(), DATE_TIME_FORMAT))
+
+
+def to_datetime(timestamp: int) -> datetime:
+    return _EPOCH + timedelta(seconds=timestamp)
+
+
+def format_timestamp(timestamp: int) -> str:
+    return to_datetime(timestamp).strftime(DATE_TIME_FORMAT)
+
+
+def parse_row(row: list) -> tuple[int, int, str]:
+    """ 把一行 CSV 数据解析为 (时间戳, 持续秒数, 备注) """
+    date_time, minute, second, *rest = row
+    note = rest[0] if rest and rest[0] else ''
+    return parse_date_time(date_time), int(minute) * 60 + int(second), note
+
+
+def read_rows(data: bytes, rejected: list[list[str]] | None = None) -> list[tuple[int, int, str]]:
+    """ 解析完整的 CSV 文件内容，标题不匹配时抛出 ValueError
+
+    给出 `rejected` 时，无法解析的行原样放进 `rejected` 后继续读取（读取已保存的数据时使用），
+    否则遇到这样的行直接抛出 ValueError（用户导入文件时使用）。
+    """
+    reader = csv.reader(io.StringIO(data.decode('utf-8'), newline=''))
+    header = next(reader, HEADER)
+    if header != HEADER:
+        raise ValueError("文件格式不正确，标题不匹配。")
+    if rejected is None:
+        return [parse_row(row) for row in reader if row]
+    rows = []
+    for row in reader:
+        if not row:
+            continue
+        try:
+            rows.append(parse_row(row))
+        except ValueError:
+            rejected.append(row)
+    return rows
+
+
+def save_rejected(path: Path, rows: list[list[str]]):
+    """ 把读取时跳过的行追加到 `path`，文件不存在时先写标题 """
+    exists = path.exists()
+    with open(path, 'a', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        if not exists:
+            writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+class Record(NamedTuple):
+    id: int
+    timestamp: int
+    duration: int
+    note: str
+
+    @property
+    def date_time(self) -> str:
+        return format_timestamp(self.timestamp)
+
+    @property
+    def minute(self) -> int:
+        return self.duration // 60
+
+    @property
+    def second(self) -> int:
+        return self.duration % 60
+
+    def to_row(self) -> list:
+        return [self.date_time, self.minute, self.second, self.note]
+
+
+class HistoryStore:
+    """ 列式存储的历史记录，与界面无关
+
+    时间戳和持续时间存放在 `array` 中，备注放在字符串表里，相同的备注只保留一份。
+    每条记录有一个自增的 id，界面和持久化层都通过 id 引用记录。
+
+    `insert`、`update` 等是按位置的基本操作，不关心顺序；`HistoryRepository` 用 `insertion_point`
+    和 `merge` 让记录始终按时间从新到旧排列，时间相同时后添加的在前。
+    """
+
+    def __init__(self):
+        self.ids = array('q')
+        self.timestamps = array('q')
+        self.durations = array('q')
+        self.notes: list[str] = []
+        self._note_table: dict[str, str] = {}
+        self._next_id = 1
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[Record]:
+        return map(Record, self.ids, self.timestamps, self.durations, self.notes)
+
+    def _intern(self, note: str | None) -> str:
+        note = note or ''
+        return self._note_table.setdefault(note, note)
+
+    def position(self, record_id: int, timestamp: int | None = None) -> int:
+        """ 记录在 store 中的位置，不存在时抛出 ValueError
+
+        给出记录的时间戳时先在时间相同的记录中二分查找，是 O(log n)；找不到或没有给出时逐个比较 id。
+        """
+        if timestamp is not None:
+            start = self.insertion_point(timestamp)
+            end = bisect_right(self.timestamps, -timestamp, lo=start, key=neg)
+            for position in range(start, end):
+                if self.ids[position] == record_id:
+                    return position
+        return self.ids.index(record_id)
+
+    def at(self, position: int) -> Record:
+        return Record(self.ids[position], self.timestamps[position], self.durations[position], self.notes[position])
+
+    def get(self, record_id: int) -> Record:
+        return self.at(self.position(record_id))
+
+    def insertion_point(self, timestamp: int) -> int:
+        """ 按时间从新到旧的顺序，新记录应该插入的位置（排在时间相同的记录之前） """
+        return bisect_left(self.timestamps, -timestamp, key=neg)
+
+    def is_sorted(self) -> bool:
+        timestamps = self.timestamps
+        return all(map(int.__ge__, timestamps, timestamps[1:]))
+
+    def sort(self):
+        """ 按时间从新到旧重新排列，时间相同的记录中原来靠后的（旧数据按添加顺序保存，即后添加的）排在前面 """
+        order = sorted(range(len(self)), key=lambda position: (self.timestamps[position], position), reverse=True)
+        self.ids = array('q', map(self.ids.__getitem__, order))
+        self.timestamps = array('q', map(self.timestamps.__getitem__, order))
+        self.durations = array('q', map(self.durations.__getitem__, order))
+        self.notes = list(map(self.notes.__getitem__, order))
+
+    def insert(self, position: int, timestamp: int, duration: int, note: str | None = None, record_id: int | None = None) -> int:
+        """ 插入一条记录并返回它的 id，`record_id` 用于沿用持久化层中已有的 id """
+        if record_id is None:
+            record_id = self._next_id
+        self._next_id = max(self._next_id, record_id + 1)
+        self.ids.insert(position, record_id)
+        self.timestamps.insert(position, timestamp)
+        self.durations.insert(position, duration)
+        self.notes.insert(position, self._intern(note))
+        return record_id
+
+    def append(self, timestamp: int, duration: int, note: str | None = None, record_id: int | None = None) -> int:
+        return self.insert(len(self), timestamp, duration, note, record_id)
+
+    def extend(self, rows: Iterable[tuple[int, int, str]]) -> list[int]:
+        return [self.append(*row) for row in rows]
+
+    def extend_columns(self, timestamps: array, durations: array, note_table: list[str], note_index: Iterable[int]):
+        """ 整列追加，`note_index` 中是每条记录的备注在 `note_table` 中的序号，用于从二进制快照加载 """
+        table = [self._intern(note) for note in note_table]
+        self.ids.extend(array('q', range(self._next_id, self._next_id + len(timestamps))))
+        self._next_id += len(timestamps)
+        self.timestamps.extend(timestamps)
+        self.durations.extend(durations)
+        self.notes.extend(map(table.__getitem__, note_index))
+
+    def insert_many(self, rows: list[tuple[int, int, int, str]]) -> list[int]:
+        """ 批量插入 (位置, 时间戳, 持续时间, 备注)，位置是插入后的最终位置且必须递增
+
+        结果与逐条 `insert` 相同，但只把各列重建一次，不会每插入一条就移动后面的全部数据。
+        """
+        ids, timestamps, durations = array('q'), array('q'), array('q')
+        notes: list[str] = []
+        new_ids = []
+        start = 0
+        for count, (position, timestamp, duration, note) in enumerate(rows):
+            end = position - count  # 插入点之前原有的记录数
+            ids.extend(self.ids[start:end])
+            timestamps.extend(self.timestamps[start:end])
+            durations.extend(self.durations[start:end])
+            notes.extend(self.notes[start:end])
+            start = end
+            new_ids.append(self._next_id)
+            ids.append(self._next_id)
+            self._next_id += 1
+            timestamps.append(timestamp)
+            durations.append(duration)
+            notes.append(self._intern(note))
+        ids.extend(self.ids[start:])
+        timestamps.extend(self.timestamps[start:])
+        durations.extend(self.durations[start:])
+        notes.extend(self.notes[start:])
+        self.ids, self.timestamps, self.durations, self.notes = ids, timestamps, durations, notes
+        return new_ids
+
+    def merge(self, rows: Iterable[tuple[int, int, str]]) -> list[int]:
+        """ 把一批数据按时间归并到各自的位置，返回它们的最终位置（递增）
+
+        适用于已经按时间排好的 store，导入大量数据时不需要整体重新排序。
+        """
+        rows = sorted(rows, key=lambda row: row[0], reverse=True)
+        positions = [self.insertion_point(timestamp) + count for count, (timestamp, _, _) in enumerate(rows)]
+        self.insert_many([(position, *row) for position, row in zip(positions, rows)])
+        return positions
+
+    def update(self, record_id: int, timestamp: int, duration: int, note: str | None = None) -> Record:
+        """ 修改一条记录，返回修改前的记录 """
+        return self.update_at(self.position(record_id), timestamp, duration, note)
+
+    def update_at(self, position: int, timestamp: int, duration: int, note: str | None = None) -> Record:
+        old = self.at(position)
+        self.timestamps[position] = timestamp
+        self.durations[position] = duration
+        self.notes[position] = self._intern(note)
+        return old
+
+    def remove(self, record_id: int) -> Record:
+        return self.remove_at(self.position(record_id))
+
+    def remove_at(self, position: int) -> Record:
+        old = self.at(position)
+        del self.ids[position]
+        del self.timestamps[position]
+        del self.durations[position]
+        del self.notes[position]
+        return old
+
+    def clear(self):
+        del self.ids[:]
+        del self.timestamps[:]
+        del self.durations[:]
+        self.notes.clear()
+        self._note_table.clear()
+
+    def copy(self) -> HistoryStore:
+        """ 复制所有列，用于在后台线程中读取某一时刻的数据 """
+        store = HistoryStore()
+        store.ids = self.ids[:]
+        store.timestamps = self.timestamps[:]
+        store.durations = self.durations[:]
+        store.notes = self.notes[:]
+        store._note_table = self._note_table.copy()
+        store._next_id = self._next_id
+        return store
+
+    def rows(self) -> Iterator[list]:
+        """ 逐行生成 CSV 数据，不会一次性构造整个列表 """
+        for record in self:
+            yield record.to_row()
+
+    def write_csv(self, path: Path | str):
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADER)
+            writer.writerows(self.rows())
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Sequence
+
+from core.backend import StorageBackend
+from core.store import HistoryStore, Record
+
+RETRY_INTERVAL = 5.0  # 写入失败后重写存储的重试间隔（秒）
+
+
+@dataclass(frozen=True)
+class WritePolicy:
+    """ 后台写入的合并策略，用写放大换取持久性
+
+    - `debounce`：最后一次修改之后等待多少秒没有新的修改才写入；
+    - `max_staleness`：最早的一次未写入的修改最多等待多少秒，连续不断的修改也不会无限推迟写入；
+    - `max_pending`：排队的操作达到这个数量时立即写入。
+    """
+    debounce: float = 0.2
+    max_staleness: float = 2.0
+    max_pending: int = 256
+
+    @classmethod
+    def from_env(cls) -> WritePolicy:
+        """ 从环境变量 `DICK_HELPER_WRITE_DEBOUNCE`、`DICK_HELPER_WRITE_MAX_STALENESS`、
+        `DICK_HELPER_WRITE_MAX_PENDING` 读取，未设置的使用默认值 """
+        default = cls()
+        return cls(
+            debounce=float(os.environ.get('DICK_HELPER_WRITE_DEBOUNCE', default.debounce)),
+            max_staleness=float(os.environ.get('DICK_HELPER_WRITE_MAX_STALENESS', default.max_staleness)),
+            max_pending=int(os.environ.get('DICK_HELPER_WRITE_MAX_PENDING', default.max_pending)),
+        )
+
+
+class WriteBehindBackend(StorageBackend):
+    """ 把另一个后端的写入放到后台线程中进行
+
+    增删改只把操作放进队列就立即返回。后台线程按 `WritePolicy` 等到修改告一段落，
+    再取出队列中积攒的全部操作，在后端的一个事务中写入（日志只 fsync 一次，SQLite 只提交一次），
+    连续删除多条或添加后马上编辑只会产生一次写入。
+    查询和手动压缩之前会先等待队列写完；`close` 会写完队列再关闭后端，
+    进程退出时也会通过 atexit 做同样的事。
+
+    `lock` 是修改 store 时持有的锁。后端的自动压缩需要复制 store，
+    只有在队列为空且能拿到这个锁时才会进行，保证副本与已写入的内容一致。
+
+    写入出错时调用 `on_error`。日志按位置定位记录，丢了一批操作之后再追加的操作都会落到错误的记录上，
+    所以出错之后不再写入任何操作，而是在拿到 `lock` 时丢弃队列（这些修改已经在 store 中），
+    用 `rewrite` 按 store 整个重写存储，成功后才恢复正常写入；失败时每隔 `RETRY_INTERVAL` 秒重试。
+    """
+
+    def __init__(
+        self,
+        inner: StorageBackend,
+        lock: threading.RLock,
+        on_error: Callable[[Exception], None] | None = None,
+        policy: WritePolicy | None = None
+    ):
+        self.inner = inner
+        self.lock = lock
+        self.on_error = on_error
+        self.policy = policy or WritePolicy()
+        self._cond = threading.Condition()
+        self._queue: list[tuple[str, tuple]] = []
+        self._queued = 0
+        self._taken = 0  # 已经从队列中取出的操作数
+        self._written = 0
+        self._covered = 0  # 序号不超过它的操作已经包含在重写的存储中
+        self._diverged = False  # 有写入失败，存储与 store 不一致
+        self._write_lock = threading.Lock()  # 写入一批操作和重写存储不能同时进行
+        self._flush_target = 0  # flush 要求立即写到的操作序号
+        self._first_queued_at = 0.0
+        self._last_queued_at = 0.0
+        self._closing = False
+        self._thread: threading.Thread | None = None
+
+    @property
+    def rejected(self) -> Sequence[list[str]]:
+        return self.inner.rejected
+
+    @property
+    def rejected_file(self) -> Path | None:
+        return self.inner.rejected_file
+
+    def load(self, store: HistoryStore):
+        self.store = store
+        self.inner.load(store)
+        self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _enqueue(self, name: str, *args):
+        with self._cond:
+            self._last_queued_at = time.monotonic()
+            if not self._queue:
+                self._first_queued_at = self._last_queued_at
+            self._queue.append((name, args))
+            self._queued += 1
+            self._cond.notify_all()
+
+    def records_added(self, records: list[tuple[int, Record]]):
+        self._enqueue('records_added', records)
+
+    def record_updated(self, position: int, record: Record):
+        self._enqueue('record_updated', position, record)
+
+    def record_removed(self, position: int, record: Record):
+        self._enqueue('record_removed', position, record)
+
+    def cleared(self):
+        self._enqueue('cleared')
+
+    def _take(self) -> tuple[list[tuple[str, tuple]], int] | None:
+        """ 等待并取出队列中的全部操作和最后一个操作的序号，关闭后队列为空时返回 None
+
+        存储与 store 不一致而又没有新的操作时，每隔 `RETRY_INTERVAL` 秒返回一个空批次，让调用方重试重写。
+        """
+        with self._cond:
+            while True:
+                while not self._queue and not self._closing:
+                    if not self._cond.wait(RETRY_INTERVAL if self._diverged else None) and self._diverged:
+                        return [], self._taken
+                while self._queue and not self._due():
+                    deadline = min(self._last_queued_at + self.policy.debounce, self._first_queued_at + self.policy.max_staleness)
+                    self._cond.wait(max(0.0, deadline - time.monotonic()))
+                if self._queue:
+                    ops, self._queue = self._queue, []
+                    self._taken += len(ops)
+                    return ops, self._taken
+                if self._closing:
+                    return None
+                # 等待期间队列被重写清空了，继续等待新的操作
+
+    def _due(self) -> bool:
+        """ 队列是否应该立即写入，调用时需要持有 `_cond` """
+        if self._closing or self._flush_target > self._written or len(self._queue) >= self.policy.max_pending:
+            return True
+        now = time.monotonic()
+        return (now - self._last_queued_at >= self.policy.debounce
+                or now - self._first_queued_at >= self.policy.max_staleness)
+
+    def _report(self, error: Exception):
+        if self.on_error is not None:
+            self.on_error(error)
+
+    def _run(self):
+        while (taken := self._take()) is not None:
+            ops, last = taken
+            with self._write_lock:
+                # 出错之后的操作不再写入；已经被重写包含的旧批次也不能再写一遍
+                if ops and not self._diverged and last > self._covered:
+                    try:
+                        with self.inner.transaction():
+                            for name, args in ops:
+                                getattr(self.inner, name)(*args)
+                    except Exception as error:
+                        self._diverged = True
+                        self._report(error)
+            with self._cond:
+                self._written += len(ops)
+                self._cond.notify_all()
+            if self._diverged:
+                self._resync(blocking=False)
+            else:
+                self._maybe_compact()
+
+    def _resync(self, blocking: bool) -> bool:
+        """ 存储与 store 不一致时按 store 整个重写，返回存储现在是否一致 """
+        if not self.lock.acquire(blocking=blocking):
+            return False  # store 正在被修改，稍后重试
+        try:
+            with self._write_lock:
+                if not self._diverged:
+                    return True
+                # 持有 lock 时 store 已经包含了排队中的全部修改，重写之后它们不需要再写
+                with self._cond:
+                    self._written += len(self._queue)
+                    self._queue = []
+                    self._taken = self._covered = self._queued
+                    self._cond.notify_all()
+                try:
+                    self.inner.rewrite(self.store)
+                except Exception as error:
+                    self._report(error)
+                    return False
+                self._diverged = False
+                return True
+        finally:
+            self.lock.release()
+
+    def _maybe_compact(self):
+        if not self.lock.acquire(blocking=False):
+            return  # store 正在被修改，下一批写完后再检查
+        try:
+            with self._cond:
+                idle = not self._queue
+            if idle:
+                self.inner.maybe_compact(self.store)
+        except Exception as error:
+            if self.on_error is not None:
+                self.on_error(error)
+        finally:
+            self.lock.release()
+
+    def flush(self):
+        """ 不再等待安静期，立即写入目前为止排队的操作并等待写完；之前有写入失败时先重写存储 """
+        with self._cond:
+            target = self._flush_target = self._queued
+            self._cond.notify_all()
+            while self._written < target and self._thread is not None and self._thread.is_alive():
+                self._cond.wait()
+        if self._diverged:
+            self._resync(blocking=True)
+
+    def compact(self, store: HistoryStore):
+        self.flush()
+        if not self._diverged:
+            self.inner.compact(store)
+
+    def rewrite(self, store: HistoryStore):
+        with self._write_lock:
+            self._diverged = True
+        self._resync(blocking=True)
+
+    def count_between(self, start: int, end: int) -> int:
+        self.flush()
+        return self.inner.count_between(start, end)
+
+    def records_between(self, start: int, end: int) -> list[Record]:
+        self.flush()
+        return self.inner.records_between(start, end)
+
+    def page(self, offset: int, limit: int) -> list[Record]:
+        self.flush()
+        return self.inner.page(offset, limit)
+
+    def close(self):
+        """ 写完队列中的操作后关闭后端，可以重复调用 """
+        with self._cond:
+            if self._closing:
+                return
+            self._closing = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        if self._diverged:
+            self._resync(blocking=True)
+        atexit.unregister(self.close)
+        self.inner.close()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import flet as ft
+
+from core.profiling import traced
+from core.repository import HistoryRepository
+from core.store import Record, to_datetime, to_timestamp
+
+
+class RecordEditor(ft.AlertDialog):
+    """ 添加和编辑记录共用的对话框，整个应用只有一个实例
+
+    打开时绑定到一条记录的 id（添加时为 None），保存前先校验输入，
+    日期不存在或持续时间不是整数时在对应的输入框上提示，不会写入存储。
+    """
+
+    def __init__(self, repository: HistoryRepository):
+        super().__init__()
+        self.repository = repository
+        self.record_id: int | None = None
+
+        self.year_field = ft.TextField(label='年', width=65, keyboard_type=ft.KeyboardType.NUMBER)
+        self.month_field = ft.TextField(label='月', width=50, keyboard_type=ft.KeyboardType.NUMBER)
+        self.day_field = ft.TextField(label='日', width=50, keyboard_type=ft.KeyboardType.NUMBER)
+        self.hour_field = ft.TextField(label='时', width=50, keyboard_type=ft.KeyboardType.NUMBER)
+        self.minute_field = ft.TextField(label='分', width=50, keyboard_type=ft.KeyboardType.NUMBER)
+        self.second_field = ft.TextField(label='秒', width=50, keyboard_type=ft.KeyboardType.NUMBER)
+        self.minute_duration_field = ft.TextField(label='分', width=45, keyboard_type=ft.KeyboardType.NUMBER)
+        self.second_duration_field = ft.TextField(label='秒', width=45, keyboard_type=ft.KeyboardType.NUMBER)
+        self.note_field = ft.TextField(label='备注', width=230)
+        self.error_text = ft.Text(size=12, color=ft.Colors.ERROR, visible=False)
+
+        self.modal = True
+        self.content = ft.Column(
+            [
+                ft.Row([self.year_field, ft.Text('-'), self.month_field, ft.Text('-'), self.day_field]),
+                ft.Row([self.hour_field, ft.Text(':'), self.minute_field, ft.Text(':'), self.second_field]),
+                ft.Row([ft.Text('持续时间：', size=18), self.minute_duration_field, self.second_duration_field]),
+                self.note_field,
+                self.error_text
+            ],
+            height=244,
+            tight=True
+        )
+        self.actions = [
+            ft.TextButton("保存", on_click=self.save),
+            ft.TextButton("取消", on_click=lambda e: self.page.close(self)),
+        ]
+        self.actions_alignment = ft.MainAxisAlignment.END
+        self.on_dismiss = lambda e: self.page.close(self)
+
+    @property
+    def date_fields(self) -> list[ft.TextField]:
+        return [self.year_field, self.month_field, self.day_field, self.hour_field, self.minute_field, self.second_field]
+
+    def open_add(self, page: ft.Page):
+        """ 打开空白的添加对话框，日期默认为现在 """
+        self._bind(None, to_timestamp(datetime.now().replace(microsecond=0)), 0, '')
+        self.title = ft.Text('添加记录')
+        page.open(self)
+
+    def open_edit(self, page: ft.Page, record: Record):
+        self._bind(record.id, record.timestamp, record.duration, record.note)
+        self.title = ft.Text('编辑记录')
+        page.open(self)
+
+    def _bind(self, record_id: int | None, timestamp: int, duration: int, note: str):
+        self.record_id = record_id
+        date_time = to_datetime(timestamp)
+        self.year_field.value = str(date_time.year)
+        for field, value in zip(self.date_fields[1:], date_time.timetuple()[1:6]):
+            field.value = f'{value:02d}'
+        self.minute_duration_field.value = str(duration // 60)
+        self.second_duration_field.value = str(duration % 60)
+        self.note_field.value = note or ''
+        for field in self._all_fields():
+            field.error_text = None
+        self.error_text.visible = False
+
+    def _all_fields(self) -> list[ft.TextField]:
+        return [*self.date_fields, self.minute_duration_field, self.second_duration_field]
+
+    def _validate(self) -> tuple[int, int, str] | None:
+        """ 把输入解析为 (时间戳, 持续秒数, 备注)，有错误时标记输入框并返回 None """
+        for field in self._all_fields():
+            field.error_text = None
+        # isdigit 也接受 '²' 这样 int 无法解析的字符，所以只接受 ASCII 数字
+        texts = [(field.value or '').strip() for field in self._all_fields()]
+        invalid = [field for field, text in zip(self._all_fields(), texts) if not (text.isascii() and text.isdigit())]
+        if invalid:
+            for field in invalid:
+                field.error_text = ' '
+            return self._fail('请填写非负整数。')
+
+        *date_values, minute_duration, second_duration = map(int, texts)
+        try:
+            date_time = datetime(*date_values)
+        except (ValueError, OverflowError):
+            for field in self.date_fields:
+                field.error_text = ' '
+            return self._fail('日期或时间不存在。')
+
+        if second_duration >= 60:
+            self.second_duration_field.error_text = ' '
+            return self._fail('秒数应小于 60。')
+
+        self.error_text.visible = False
+        return to_timestamp(date_time), minute_duration * 60 + second_duration, self.note_field.value or ''
+
+    def _fail(self, message: str) -> None:
+        self.error_text.value = message
+        self.error_text.visible = True
+        self.update()
+        return None
+
+    @traced('RecordEditor.save')
+    def save(self, e):
+        row = self._validate()
+        if row is None:
+            return
+        if self.record_id is None:
+            self.repository.add(*row)
+        else:
+            try:
+                self.repository.update(self.record_id, *row)
+            except ValueError:
+                self._fail('这条记录已被删除。')
+                return
+        self.page.close(self)
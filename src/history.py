@@ -1,12 +1,17 @@
 from __future__ import annotations
 
-import csv
-from pathlib import Path
+from datetime import datetime, timedelta
 from typing import Callable
 
 import flet as ft
 
-from utils import Observable
+from core.events import ChangeEvent, RecordRemoved, RecordsAdded, RecordUpdated
+from core.profiling import PROFILER
+from core.query import HistoryQuery, SortKey
+from core.repository import HistoryRepository
+from core.search import HistorySearch, SearchQuery
+from core.store import Record, to_timestamp
+from editor import RecordEditor
 
 
 class TimeCard(ft.Container):
@@ -28,33 +33,24 @@ class TimeCard(ft.Container):
 class NoteCard(ft.Container):
     def __init__(self, note: str | None = None):
         super().__init__()
-        self.note = note
-
         self.bgcolor = ft.Colors.GREY_400
         self.padding = ft.padding.all(6)
         self.border_radius = ft.border_radius.all(12)
-        self.content = ft.Text(
-            f'备注：{self.note}',
-            size=12,
-            color=ft.Colors.BLACK
-        ) if self.note else None
+        self.content = ft.Text(size=12, color=ft.Colors.BLACK)
+        self.set_note(note)
+
+    def set_note(self, note: str | None):
+        self.note = note
+        self.content.value = f'备注：{self.note}'
+        self.visible = bool(self.note)
 
 
 class HistoryCard(ft.Container):
-    def __init__(self, date_time: str, minute: str, second: str, note: str | None = None, delete_callback: Callable[[HistoryCard], None] = None, save_callback: Callable[[], None] = None):
+    def __init__(self, record: Record, delete_callback: Callable[[HistoryCard], None] = None, edit_callback: Callable[[HistoryCard], None] = None):
         super().__init__()
-        self.date_time = date_time
-        self.year = self.tmp_year = self.date_time.split('-')[0]
-        self.month = self.tmp_month = self.date_time.split('-')[1]
-        self.day = self.tmp_day = self.date_time.split('-')[2].split(' ')[0]
-        self.hour = self.tmp_hour = self.date_time.split(' ')[1].split(':')[0]
-        self.minute = self.tmp_minute = self.date_time.split(' ')[1].split(':')[1]
-        self.second = self.tmp_second = self.date_time.split(' ')[1].split(':')[2]
-        self.minute_duration = self.tmp_minute_duration = minute
-        self.second_duration = self.tmp_second_duration = second
-        self.note = self.tmp_note = note
+        self._set_record(record)
         self.delete_callback = delete_callback
-        self.save_callback = save_callback
+        self.edit_callback = edit_callback
 
         self.date_time_text = ft.Text(self.date_time, size=14, color=ft.Colors.BLUE, weight=ft.FontWeight.BOLD)
         self.time_card = TimeCard(self.minute_duration, self.second_duration)
@@ -91,113 +87,105 @@ class HistoryCard(ft.Container):
             color=ft.Colors.with_opacity(0.2, ft.Colors.BLUE_GREY_200),
             offset=ft.Offset(1, 1)
         )
+        self.margin = ft.margin.only(bottom=HistoryPage.ROW_SPACING)
 
-        self.edit_dlg = ft.AlertDialog(
-            modal=True,
-            title='编辑记录',
-            content=ft.Column(
-                [
-                    ft.Row(
-                        [
-                            ft.TextField(label='年', width=65, value=self.year, keyboard_type=ft.KeyboardType.NUMBER,
-                                         on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_year')),
-                            ft.Text('-'),
-                            ft.TextField(label='月', width=50, value=self.month, keyboard_type=ft.KeyboardType.NUMBER,
-                                         on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_month')),
-                            ft.Text('-'),
-                            ft.TextField(label='日', width=50, value=self.day, keyboard_type=ft.KeyboardType.NUMBER,
-                                         on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_day')),
-                        ]
-                    ),
-                    ft.Row(
-                        [
-                            ft.TextField(label='时', width=50, value=self.hour, keyboard_type=ft.KeyboardType.NUMBER,
-                                         on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_hour')),
-                            ft.Text(':'),
-                            ft.TextField(label='分', width=50, value=self.minute, keyboard_type=ft.KeyboardType.NUMBER,
-                                         on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_minute')),
-                            ft.Text(':'),
-                            ft.TextField(label='秒', width=50, value=self.second, keyboard_type=ft.KeyboardType.NUMBER,
-                                         on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_second')),
-                        ]
-                    ),
-                    ft.Row(
-                        [
-                            ft.Text('持续时间：', size=18),
-                            ft.TextField(label='分', width=45, value=str(self.minute_duration), keyboard_type=ft.KeyboardType.NUMBER,
-                                         on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_minute_duration')),
-                            ft.TextField(label='秒', width=45, value=str(self.second_duration), keyboard_type=ft.KeyboardType.NUMBER,
-                                         on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_second_duration'))
-                        ]
-                    ),
-                    ft.TextField(label='备注', width=230, value=self.note, on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_note'))
-                ],
-                height=222
-            ),
-            actions=[
-                ft.TextButton("保存", on_click=self.save_change),
-                ft.TextButton("取消", on_click=lambda e: self.page.close(self.edit_dlg)),
-            ],
-            actions_alignment=ft.MainAxisAlignment.END,
-            on_dismiss=lambda e: self.page.close(self.edit_dlg)
-        )
+    def bind(self, record: Record):
+        """ 把卡片重新绑定到另一条记录，用于列表滚动时复用控件 """
+        self._set_record(record)
+        self._update()
 
-    def on_edit_dlg_change(self, e, name: str):
-        new_value = e.control.value
-        setattr(self, name, new_value)
+    def _set_record(self, record: Record):
+        self.record = record
+        self.record_id = record.id
+        self.date_time = record.date_time
+        self.minute_duration = record.minute
+        self.second_duration = record.second
+        self.note = record.note
 
     def _update(self):
         self.date_time_text.value = self.date_time
-        self.time_card.content.value = f'持续时间：{self.minute}分{self.second}秒'
-        self.note_card.content.value = f'备注：{self.note}'
-
-    def save_change(self, e):
-        self.year = self.tmp_year
-        self.month = self.tmp_month
-        self.day = self.tmp_day
-        self.hour = self.tmp_hour
-        self.minute = self.tmp_minute
-        self.second = self.tmp_second
-        self.minute_duration = self.tmp_minute_duration
-        self.second_duration = self.tmp_second_duration
-        self.note = self.tmp_note
-        self.date_time = f'{self.year}-{self.month}-{self.day} {self.hour}:{self.minute}:{self.second}'
-        print(self.date_time)
-        self._update()
-        self.save_callback()
-        self.update()
-        self.page.close(self.edit_dlg)
+        self.time_card.content.value = f'持续时间：{self.minute_duration}分{self.second_duration}秒'
+        self.note_card.set_note(self.note)
 
     def edit(self, e):
-        self.page.open(self.edit_dlg)
+        self.edit_callback(self)
 
     def delete(self, e):
         self.delete_callback(self)
 
 
-class HistoryPage(ft.Column, Observable):
-    def __init__(self):
+class HistoryPage(ft.Column):
+    ROW_HEIGHT = 84  # HistoryCard 内容高度 60 + 上下内边距各 12
+    ROW_SPACING = 10
+    ROW_EXTENT = ROW_HEIGHT + ROW_SPACING
+    OVERSCAN = 10  # 可视区域上下各多渲染的行数
+    SORT_OPTIONS = {
+        'time-desc': (SortKey.TIME, True, '最新在前'),
+        'time-asc': (SortKey.TIME, False, '最早在前'),
+        'duration-desc': (SortKey.DURATION, True, '时长最长'),
+        'duration-asc': (SortKey.DURATION, False, '时长最短'),
+    }
+
+    def __init__(self, repository: HistoryRepository, editor: RecordEditor):
         super().__init__()
-        Observable.__init__(self)
-        self.work_dir = Path.cwd()
-        self.history_file = self.work_dir / 'history.csv'
-        try:
-            with open(self.history_file, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                self.header = next(reader)
-                self.history_cards = [
-                    HistoryCard(*row, self.delete, self.save) for row in reader
-                ]
-        except FileNotFoundError:
-            self.header = ['date_time', 'minute', 'second', 'note']
-            self.history_cards = []
-            self.save()
+        self.repository = repository
+        self.editor = editor
+        self.store = repository.store
+        # 在锁内建立索引、订阅并渲染，期间发布的变化不会漏掉，也不会在渲染之前就投递过来
+        with self.repository.lock:
+            # 搜索索引和排序要先于列表处理变化事件
+            self.search = HistorySearch(self.store)
+            self.history_query = HistoryQuery(self.store)
+            self.repository.subscribe(ChangeEvent, self.search.handle)
+            self.repository.subscribe(ChangeEvent, self.history_query.handle)
+            # 单条记录的变化只修补受影响的卡片或占位高度，发给前端的消息与变化的大小成正比
+            self.repository.subscribe(ChangeEvent, self._on_change)
+            # 有搜索条件时列表只显示 `_results` 中的记录（store 中的位置），否则显示全部
+            self._results: list[int] | None = None
+            self.sort = SortKey.TIME
+            self.descending = True
+
+            # 列表只为可视区域附近的记录创建卡片，`_cards` 是当前显示的卡片，离开窗口的卡片放进
+            # `_spare` 留待复用；上下两个占位容器撑出未渲染部分的高度，使滚动条长度与记录总数一致
+            self._cards: list[HistoryCard] = []
+            self._spare: list[HistoryCard] = []
+            self._first = 0
+            self._viewport = 700
+            self.top_spacer = ft.Container(height=0)
+            self.bottom_spacer = ft.Container(height=0)
+            self.list_view = ft.ListView(
+                expand=True,
+                spacing=0,
+                on_scroll=self.on_scroll,
+                on_scroll_interval=50
+            )
+            self._render()
+
+        self.search_field = ft.TextField(
+            hint_text='搜索备注',
+            prefix_icon=ft.Icons.SEARCH,
+            dense=True,
+            expand=True,
+            on_change=self.on_search_change
+        )
+        self.start_field = ft.TextField(label='起始日期', hint_text='2024-01-01', width=120, dense=True, on_change=self.on_search_change)
+        self.end_field = ft.TextField(label='结束日期', hint_text='2024-12-31', width=120, dense=True, on_change=self.on_search_change)
+        self.min_field = ft.TextField(label='最短(分)', width=80, dense=True, keyboard_type=ft.KeyboardType.NUMBER, on_change=self.on_search_change)
+        self.max_field = ft.TextField(label='最长(分)', width=80, dense=True, keyboard_type=ft.KeyboardType.NUMBER, on_change=self.on_search_change)
+        self.filter_row = ft.Row([self.start_field, self.end_field, self.min_field, self.max_field], wrap=True, visible=False)
+        self.result_text = ft.Text(size=12, color=ft.Colors.GREY, visible=False)
+        self.sort_dropdown = ft.Dropdown(
+            value='time-desc',
+            options=[ft.dropdown.Option(key, text) for key, (_, _, text) in self.SORT_OPTIONS.items()],
+            width=120,
+            dense=True,
+            on_change=self.on_sort_change
+        )
 
         self.expand = True
         self.alignment = ft.MainAxisAlignment.START
         self.spacing = 10
         self.width = 440
-        self.scroll = ft.ScrollMode.HIDDEN
         self.controls = [
             ft.Row(
                 [
@@ -207,109 +195,219 @@ class HistoryPage(ft.Column, Observable):
                 alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
                 vertical_alignment=ft.CrossAxisAlignment.CENTER
             ),
-            *self.history_cards
+            ft.Row([self.search_field, self.sort_dropdown, ft.IconButton(ft.Icons.FILTER_LIST, on_click=self.toggle_filters)]),
+            self.filter_row,
+            self.result_text,
+            self.list_view
         ]
-        self.file_picker = ft.FilePicker(on_result=self.on_file_picker_result)
-
-    def save(self, path: Path | str | None = None):
-        with open(path or self.history_file, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(self.header)
-            for card in self.history_cards:
-                writer.writerow([card.date_time, card.minute, card.second, card.note])
-
-    def add(self, card: HistoryCard = None, data: list[str | None] = None):
-        if data:
-            card = HistoryCard(*data, self.delete, self.save)
-        self.history_cards.insert(0, card)
-        self.controls.insert(1, card)
-        self.save()
-        self.notify_callbacks()
 
-    def delete(self, card: HistoryCard):
-        self.history_cards.remove(card)
-        self.controls.remove(card)
-        self.save()
-        self.update()
-        self.notify_callbacks()
-
-    def delete_all(self, e):
-        self.history_cards = []
-        self.controls = self.controls[:1]
-        self.save()
-        self.update()
-        self.notify_callbacks()
-
-    def export_csv(self, e):
-        self.file_picker.save_file(
-            dialog_title="选择导出路径",
-            file_name='history.csv',
-            allowed_extensions=['csv']
+    @property
+    def _window_size(self) -> int:
+        return -(-self._viewport // self.ROW_EXTENT) + 2 * self.OVERSCAN
+
+    def _card_for(self, record: Record) -> HistoryCard:
+        if not self._spare:
+            return HistoryCard(record, self.delete, self.edit)
+        card = self._spare.pop()
+        card.bind(record)
+        return card
+
+    def _card_by_id(self, record_id: int) -> HistoryCard | None:
+        return next((card for card in self._cards if card.record_id == record_id), None)
+
+    def _row_count(self) -> int:
+        return len(self.store) if self._results is None else len(self._results)
+
+    def _fetch(self, first: int, count: int) -> list[Record]:
+        """ 按当前的排序读取从第 first 行开始的一页记录 """
+        if self._results is None:
+            return self.history_query.rows(self.sort, self.descending, first, count)
+        return [self.store.at(position) for position in self._results[first:first + count]]
+
+    @property
+    def _in_store_order(self) -> bool:
+        """ 列表的行是否就是 store 中的位置，只有这时才能按事件修补窗口 """
+        return self._results is None and self.sort is SortKey.TIME and self.descending
+
+    def _relist(self):
+        self.list_view.controls = [self.top_spacer, *self._cards, self.bottom_spacer]
+
+    def _render(self, first: int | None = None):
+        """ 按窗口起点重新绑定卡片并调整占位高度 """
+        with self.repository.lock:
+            total = self._row_count()
+            first = self._first if first is None else first
+            first = max(0, min(first, total - self._window_size))
+            last = min(total, first + self._window_size)
+            self._spare.extend(reversed(self._cards))
+            self._cards = [self._card_for(record) for record in self._fetch(first, last - first)]
+
+            self._first = first
+            self.top_spacer.height = first * self.ROW_EXTENT
+            self.bottom_spacer.height = (total - last) * self.ROW_EXTENT
+            self._relist()
+
+    def _consistent(self) -> bool:
+        """ 修补之后窗口是否仍与 store 一致，不一致（例如多个线程同时修改）时整体重新渲染
+
+        只比较窗口内的记录，开销与窗口大小有关而与记录总数无关。
+        """
+        total = len(self.store)
+        count = len(self._cards)
+        return (
+            count == min(self._window_size, total - self._first)
+            and self.top_spacer.height == self._first * self.ROW_EXTENT
+            and self.bottom_spacer.height == (total - self._first - count) * self.ROW_EXTENT
+            and all(card.record_id == record_id for card, record_id in zip(self._cards, self.store.ids[self._first:self._first + count]))
         )
 
-    def import_csv(self, e):
-        self.file_picker.pick_files(
-            dialog_title="选择导入文件",
-            allowed_extensions=['csv'],
-            allow_multiple=False
-        )
-
-    def on_file_picker_result(self, e: ft.FilePickerResultEvent):
-        """ 处理文件选择器结果的回调 """
-        if e.path:
-            self.export_history_to_path(Path(e.path))
-        elif e.files and e.files[0]:
-            self.import_history_from_path(Path(e.files[0].path))
-        else:
-            self.page.snack_bar = ft.SnackBar(ft.Text("操作已取消。"), duration=2000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.SECONDARY))
-            self.page.open(self.page.snack_bar)
-            self.page.update()
-
-    def export_history_to_path(self, save_path: Path):
-        """ 实际的导出逻辑 """
+    def _patch(self, event: ChangeEvent) -> list[ft.Control] | None:
+        """ 按事件修补窗口，返回需要更新的控件；无法修补时返回 None """
+        match event:
+            case RecordUpdated(new=record):
+                card = self._card_by_id(record.id)
+                if card is None:
+                    return []  # 记录如果移进了窗口，之后的一致性检查会发现
+                if self.store.position(record.id, record.timestamp) != self._first + self._cards.index(card):
+                    return None  # 修改了时间，记录移动了位置
+                card.bind(record)
+                return [card]
+            case RecordsAdded(records=(record,)):
+                return self._patch_insert(self.store.position(record.id, record.timestamp), record)
+            case RecordRemoved(record=record):
+                return self._patch_remove(record)
+        return None
+
+    def _patch_insert(self, position: int, record: Record) -> list[ft.Control]:
+        last = self._first + len(self._cards)
+        if position < self._first:
+            self._first += 1
+            self.top_spacer.height += self.ROW_EXTENT
+            return [self.top_spacer]
+        if position > last or (position == last and len(self._cards) >= self._window_size):
+            self.bottom_spacer.height += self.ROW_EXTENT
+            return [self.bottom_spacer]
+        self._cards.insert(position - self._first, self._card_for(record))
+        if len(self._cards) > self._window_size:
+            self._spare.append(self._cards.pop())
+            self.bottom_spacer.height += self.ROW_EXTENT
+        self._relist()
+        return [self.list_view]
+
+    def _patch_remove(self, record: Record) -> list[ft.Control]:
+        card = self._card_by_id(record.id)
+        if card is None:
+            # 删除的记录不在窗口内：窗口第一条记录的位置前移了，说明删除的是窗口之前的记录
+            first = self._cards[0].record if self._cards else None
+            if first is not None and self.store.position(first.id, first.timestamp) < self._first:
+                self._first -= 1
+                self.top_spacer.height -= self.ROW_EXTENT
+                return [self.top_spacer]
+            self.bottom_spacer.height -= self.ROW_EXTENT
+            return [self.bottom_spacer]
+        self._cards.remove(card)
+        self._spare.append(card)
+        following = self._first + len(self._cards)
+        if following < len(self.store):
+            self._cards.append(self._card_for(self.store.at(following)))
+            self.bottom_spacer.height -= self.ROW_EXTENT
+        self._relist()
+        return [self.list_view]
+
+    def _on_change(self, event: ChangeEvent):
+        with PROFILER.span('HistoryPage._on_change', event=type(event).__name__):
+            self._apply_change(event)
+
+    def _apply_change(self, event: ChangeEvent):
+        with self.repository.lock:
+            if self._results is not None:
+                # 搜索结果中的位置在修改后会失效，直接重新查询
+                self._results = self._search(self.query)
+                self._render()
+                self._show_result_count()
+                controls = [self.result_text, self.list_view]
+            elif not self._in_store_order:
+                self._render()
+                controls = [self.list_view]
+            else:
+                controls = self._patch_or_render(event)
+        if self.page:  # Ensure the page is available
+            for control in controls:
+                control.update()
+            PROFILER.count('ui_updates', len(controls))
+
+    def _patch_or_render(self, event: ChangeEvent) -> list[ft.Control]:
         try:
-            with open(save_path, 'w', encoding='utf-8', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(self.header)
-                writer.writerows([
-                    [card.date_time, card.minute, card.second, card.note]
-                    for card in self.history_cards
-                ])
-
-            self.page.snack_bar = ft.SnackBar(ft.Text(f"导出成功！路径: {save_path}"), duration=2000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.PRIMARY))
-
-        except Exception as ex:
-            self.page.snack_bar = ft.SnackBar(ft.Text(f"导出失败: {ex}"), duration=2000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.ERROR))
-        finally:
-            self.page.open(self.page.snack_bar)
-            self.page.update()
-
-    def import_history_from_path(self, file_path: Path):
-        """ 实际的导入逻辑 """
+            controls = self._patch(event)
+        except ValueError:  # 记录在事件投递前又被删除了
+            controls = None
+        if controls is None or not self._consistent():
+            self._render()
+            controls = [self.list_view]
+        return controls
+
+    @property
+    def query(self) -> SearchQuery:
+        """ 由搜索框和筛选条件组成的查询，格式不正确的条件会被标出并忽略 """
+        start = self._parse_field(self.start_field, lambda value: to_timestamp(datetime.strptime(value, '%Y-%m-%d')))
+        end = self._parse_field(self.end_field, lambda value: to_timestamp(datetime.strptime(value, '%Y-%m-%d') + timedelta(days=1)))
+        low = self._parse_field(self.min_field, lambda value: int(value) * 60)
+        high = self._parse_field(self.max_field, lambda value: int(value) * 60 + 59)
+        return SearchQuery(self.search_field.value or '', start, end, low, high)
+
+    @staticmethod
+    def _parse_field(field: ft.TextField, parse: Callable[[str], int]) -> int | None:
+        value = (field.value or '').strip()
+        field.error_text = None
+        if not value:
+            return None
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                header = next(reader)
-                if header != self.header:
-                    raise ValueError("文件格式不正确，标题不匹配。")
-
-                i = 0
-                for row in reader:
-                    card = HistoryCard(*row, self.delete, self.save)
-                    self.history_cards.append(card)
-                    self.controls.append(card)
-                    i += 1
-
-                self.save()
-                self.update()
-                self.notify_callbacks()
-
-                self.page.snack_bar = ft.SnackBar(ft.Text(f"成功导入 {i} 条记录。"), duration=2000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.PRIMARY))
-
-        except FileNotFoundError:
-            self.page.snack_bar = ft.SnackBar(ft.Text("文件未找到。"), duration=2000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.ERROR))
-        except Exception as ex:
-            self.page.snack_bar = ft.SnackBar(ft.Text(f"导入失败: {ex}"), duration=2000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.ERROR))
-        finally:
-            self.page.open(self.page.snack_bar)
-            self.page.update()
+            return parse(value)
+        except ValueError:
+            field.error_text = '格式不正确'
+            return None
+
+    def _search(self, query: SearchQuery) -> list[int]:
+        return self.history_query.sort_positions(self.search.positions(query), self.sort, self.descending)
+
+    def _show_result_count(self):
+        self.result_text.visible = self._results is not None
+        if self._results is not None:
+            self.result_text.value = f'找到 {len(self._results)} 条记录'
+
+    def on_search_change(self, e):
+        query = self.query
+        with self.repository.lock:
+            self._results = None if query.is_empty else self._search(query)
+            self._render(0)
+        self._show_result_count()
+        if self.page:  # Ensure the page is available
+            for control in (self.filter_row, self.result_text, self.list_view):
+                control.update()
+            self.list_view.scroll_to(offset=0)
+
+    def on_sort_change(self, e):
+        self.sort, self.descending, _ = self.SORT_OPTIONS[self.sort_dropdown.value]
+        self.on_search_change(e)
+
+    def toggle_filters(self, e):
+        self.filter_row.visible = not self.filter_row.visible
+        self.filter_row.update()
+
+    def on_scroll(self, e: ft.OnScrollEvent):
+        if e.viewport_dimension:
+            self._viewport = int(e.viewport_dimension)
+        first = max(0, int(e.pixels // self.ROW_EXTENT) - self.OVERSCAN)
+        # 只有窗口偏移超过预渲染行数的一半时才重新绑定，避免每个滚动事件都发送更新
+        if abs(first - self._first) >= self.OVERSCAN // 2:
+            self._render(first)
+            self.list_view.update()
+
+    def edit(self, card: HistoryCard):
+        self.editor.open_edit(self.page, card.record)
+
+    def delete(self, card: HistoryCard):
+        self.repository.remove(card.record_id)
+
+    def delete_all(self, e):
+        self.repository.clear()
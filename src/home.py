@@ -1,27 +1,34 @@
+import asyncio
 import time
-import threading
-from datetime import datetime
-from functools import cached_property
+from concurrent.futures import Future
+from datetime import datetime, timedelta
 
 import flet as ft
 
-from history import HistoryPage
+from core.events import ChangeEvent
+from core.profiling import PROFILER
+from core.repository import HistoryRepository
+from core.session import SessionCheckpoint, SessionState
+from core.stats import HistoryStats
+from core.store import parse_row
+from editor import RecordEditor
+from transfer import DataTransfer
+from trends import TrendsView
 
 
 class TimerCard(ft.Card):
     """A simple timer card """
 
-    def __init__(self, history_manager: HistoryPage):
+    def __init__(self, repository: HistoryRepository, transfer: DataTransfer):
         super().__init__()
-        self.history_manager = history_manager
+        self.repository = repository
         self.is_running = False
         self.is_paused = False
-        self.elapsed_time = 0
-        self.last_tick_time = 0
-        self.running = True  # Control the background thread
-        # Start the background thread
-        self.thread = threading.Thread(target=self.update_timer, args=(), daemon=True)
-        self.thread.start()
+        self.accumulated_time = 0.0  # Elapsed seconds before the current running segment
+        self.segment_start = 0.0  # time.monotonic() when the current running segment started
+        self.ticker: Future | None = None  # The update_timer task, only alive while running
+        self.session_started_at = 0.0  # Wall clock time when the session started
+        self.checkpoint = SessionCheckpoint(self.repository.work_dir / 'session.bin')
 
         # Static controls
         self.title_text = ft.Text(
@@ -46,17 +53,18 @@ class TimerCard(ft.Card):
             multiline=True,
             min_lines=3,
             max_lines=5,
-            expand=True
+            expand=True,
+            on_change=lambda e: self.save_checkpoint()
         )
         self.export_button = ft.TextButton(
             "导出数据",
             icon=ft.Icons.DOWNLOAD,
-            on_click=self.history_manager.export_csv
+            on_click=transfer.export_history
         )
         self.import_button = ft.TextButton(
             "导入数据",
             icon=ft.Icons.UPLOAD,
-            on_click=self.history_manager.import_csv
+            on_click=transfer.import_csv
         )
 
         self.elevation = 4.0,
@@ -78,50 +86,148 @@ class TimerCard(ft.Card):
             )
         )
 
-    def update_timer(self):
-        """Background thread function to update the timer every second."""
-        while self.running:
-            if self.is_running and not self.is_paused:
-                now = time.time()
-                self.elapsed_time += now - self.last_tick_time
-                self.last_tick_time = now
+    CHECKPOINT_INTERVAL = 5  # Seconds of elapsed time between checkpoints while running
+
+    def did_mount(self):
+        self.restore_session()
 
-                # Update UI
-                mins, secs = divmod(int(self.elapsed_time), 60)
+    @property
+    def elapsed_time(self) -> float:
+        """Elapsed seconds, measured with the monotonic clock."""
+        if self.is_running and not self.is_paused:
+            return self.accumulated_time + time.monotonic() - self.segment_start
+        return self.accumulated_time
+
+    async def update_timer(self):
+        """Refresh the display once per whole elapsed second, sleeping in between."""
+        while True:
+            with PROFILER.span('TimerCard.tick'):
+                elapsed = self.elapsed_time
+                mins, secs = divmod(int(elapsed), 60)
                 self.status_text.value = f"{mins}分{secs}秒"
                 if self.status_text.page:  # Ensure the page is available
                     self.status_text.update()
+                    PROFILER.count('ui_updates')
+                if int(elapsed) % self.CHECKPOINT_INTERVAL == 0:
+                    self.save_checkpoint()
+            # Wake up right after the displayed value changes
+            await asyncio.sleep(1 - elapsed % 1 + 0.01)
+
+    def start_ticker(self):
+        self.stop_ticker()
+        if self.page:  # Ensure the page is available
+            self.ticker = self.page.run_task(self.update_timer)
+
+    def stop_ticker(self):
+        if self.ticker is not None:
+            self.ticker.cancel()
+            self.ticker = None
+
+    def save_checkpoint(self):
+        """Persist the running session so it survives a crash or a forced close."""
+        if not self.is_running:
+            return
+        self.checkpoint.save(SessionState(
+            started_at=self.session_started_at,
+            checkpoint_at=time.time(),
+            elapsed=self.elapsed_time,
+            paused=self.is_paused,
+            note=self.notes_field.value or ''
+        ))
+
+    def restore_session(self):
+        """Offer to resume or save a session left over from the previous run."""
+        state = self.checkpoint.load()
+        if state is None:
+            return
+
+        def resume(e):
+            self.page.close(restore_dlg)
+            self.resume_session(state)
+
+        def finalize(e):
+            self.page.close(restore_dlg)
+            self.finalize_session(state)
+
+        mins, secs = divmod(int(state.elapsed), 60)
+        restore_dlg = ft.AlertDialog(
+            modal=True,
+            title='发现未结束的记录',
+            content=ft.Text(f'上次的计时在 {mins}分{secs}秒 时中断，要继续计时还是直接保存？'),
+            actions=[
+                ft.TextButton("继续计时", on_click=resume),
+                ft.TextButton("保存记录", on_click=finalize),
+            ],
+            actions_alignment=ft.MainAxisAlignment.END
+        )
+        self.page.open(restore_dlg)
+
+    def resume_session(self, state: SessionState):
+        """Continue a checkpointed session, counting the time since the checkpoint unless it was paused."""
+        self.is_running = True
+        self.is_paused = state.paused
+        self.accumulated_time = state.elapsed
+        if not state.paused:
+            self.accumulated_time += max(0.0, time.time() - state.checkpoint_at)
+        self.segment_start = time.monotonic()
+        self.session_started_at = state.started_at
+        self.notes_field.value = state.note
+        self.switch_to_running_view()
+        self.update_pause_button()
+        mins, secs = divmod(int(self.elapsed_time), 60)
+        self.status_text.value = f"{mins}分{secs}秒"
+        self.update()
+        if not self.is_paused:
+            self.start_ticker()
+        self.save_checkpoint()
 
-            time.sleep(0.5)  # Check status every 0.5 seconds for responsive pause/resume
+    def finalize_session(self, state: SessionState):
+        """Save a checkpointed session into history as it was at the last checkpoint."""
+        end = datetime.fromtimestamp(state.checkpoint_at).strftime("%Y-%m-%d %H:%M:%S")
+        mins, secs = divmod(int(state.elapsed), 60)
+        self.repository.add(*parse_row([end, mins, secs, state.note]))
+        self.checkpoint.clear()
 
     def start_clicked(self, e):
         """Handle 'Start' button click event."""
         self.is_running = True
         self.is_paused = False
-        self.elapsed_time = 0
-        self.last_tick_time = time.time()
+        self.accumulated_time = 0.0
+        self.segment_start = time.monotonic()
+        self.session_started_at = time.time()
         self.switch_to_running_view()
+        self.start_ticker()
+        self.save_checkpoint()
 
     def end_clicked(self, e):
         """Handle 'End' button click event."""
+        elapsed = self.elapsed_time
+        self.stop_ticker()
         self.is_running = False
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.mins, self.secs = divmod(int(self.elapsed_time), 60)
+        self.mins, self.secs = divmod(int(elapsed), 60)
         self.note = self.notes_field.value
-        self.history_manager.add(
-            data=[now, self.mins, self.secs, self.note]
-        )
-        self.elapsed_time = 0
+        self.repository.add(*parse_row([now, self.mins, self.secs, self.note]))
+        self.accumulated_time = 0.0
+        self.checkpoint.clear()
         self.switch_to_stopped_view()
 
     def pause_clicked(self, e):
         """Handle 'Pause/Resume' button click event."""
-        self.is_paused = not self.is_paused
-        if not self.is_paused:
-            # Reset the timing start point for resume
-            self.last_tick_time = time.time()
-
-        # Update button text and icon
+        if self.is_paused:
+            # Start a new running segment from now
+            self.segment_start = time.monotonic()
+            self.is_paused = False
+            self.start_ticker()
+        else:
+            self.accumulated_time = self.elapsed_time
+            self.is_paused = True
+            self.stop_ticker()
+        self.save_checkpoint()
+        self.update_pause_button()
+
+    def update_pause_button(self):
+        """Update button text and icon."""
         self.pause_button.text = "继续" if self.is_paused else "暂停"
         self.pause_button.icon = ft.Icons.PLAY_ARROW_ROUNDED if self.is_paused else ft.Icons.PAUSE_ROUNDED
         if self.pause_button.page:  # Ensure the page is available
@@ -196,13 +302,24 @@ class TimerCard(ft.Card):
             self.dynamic_controls_container.update()
 
     def cleanup(self):
-        """Stop the background thread when the app closes."""
-        self.running = False
+        """Checkpoint the session and stop the ticker when the app closes."""
+        self.save_checkpoint()
+        self.stop_ticker()
+        self.checkpoint.close()
 
 
-def create_card(title: str, value: str, unit: str = ""):
-    return ft.Container(
-        content=ft.Column(
+class StatCard(ft.Container):
+    """ 一项统计数据，数值变化时只更新数值文本 """
+
+    def __init__(self, title: str, value: str, unit: str = ""):
+        super().__init__()
+        self.value_text = ft.Text(
+            value,
+            size=36,
+            weight=ft.FontWeight.BOLD,
+            color=ft.Colors.BLUE
+        )
+        self.content = ft.Column(
             [
                 ft.Text(
                     title,
@@ -214,12 +331,7 @@ def create_card(title: str, value: str, unit: str = ""):
                         ft.Column(
                             [
                                 ft.Container(height=0),
-                                ft.Text(
-                                    value,
-                                    size=36,
-                                    weight=ft.FontWeight.BOLD,
-                                    color=ft.Colors.BLUE
-                                ),
+                                self.value_text,
                             ],
                             spacing=0,
                             alignment=ft.MainAxisAlignment.START
@@ -242,23 +354,33 @@ def create_card(title: str, value: str, unit: str = ""):
             spacing=5,
             alignment=ft.MainAxisAlignment.CENTER,
             horizontal_alignment=ft.CrossAxisAlignment.START,
-        ),
-        padding=ft.padding.all(15),
-        border_radius=ft.border_radius.all(12),
-        shadow=ft.BoxShadow(
+        )
+        self.padding = ft.padding.all(15)
+        self.border_radius = ft.border_radius.all(12)
+        self.shadow = ft.BoxShadow(
             spread_radius=1,
             blur_radius=3,
             color=ft.Colors.with_opacity(0.1, "black"),
             offset=ft.Offset(1, 1),
         )
-    )
+
+    def set_value(self, value: str) -> bool:
+        """ 设置数值，返回数值是否有变化 """
+        if self.value_text.value == value:
+            return False
+        self.value_text.value = value
+        return True
 
 
 class StatsView(ft.Container):
-    def __init__(self, history_manager: HistoryPage):
+    def __init__(self, repository: HistoryRepository):
         super().__init__()
-        self.history_manager = history_manager
-        self.history_manager.register_callback(self._update)
+        self.repository = repository
+        self.stats = HistoryStats(self.repository.store)
+        # 统计数据随每个事件同步更新，界面刷新则合并到下一帧
+        self.repository.subscribe(ChangeEvent, self.stats.handle)
+        self.repository.register_callback(self._update, deferred=True)
+        self.period_watcher: Future | None = None
 
         self.grid = ft.GridView(
             expand=True,
@@ -267,12 +389,7 @@ class StatsView(ft.Container):
             child_aspect_ratio=1.6,
             spacing=15,
             run_spacing=15,
-            controls=[
-                create_card("总次数", str(self.total_times)),
-                create_card("平均持续时间", str(self.avg_minute), "分钟"),
-                create_card("本周次数", str(self.this_week_times)),
-                create_card("本月次数", str(self.this_month_times)),
-            ]
+            controls=self._create_cards()
         )
         self.content = ft.Column(
             [
@@ -290,148 +407,95 @@ class StatsView(ft.Container):
 
     @property
     def total_times(self):
-        return self.history_manager.history_cards.__len__()
-
-    @cached_property
-    def _time_stats(self):
-        _minute = _second = 0
-        for card in self.history_manager.history_cards:
-            _minute += int(card.minute)
-            _second += int(card.second)
-        return _minute, _second
-
-    @property
-    def minute(self):
-        return self._time_stats[0]
-
-    @property
-    def second(self):
-        return self._time_stats[1]
+        return self.stats.total_times
 
     @property
     def avg_minute(self):
-        return round((self.minute + self.second / 60) / self.total_times, 2)
-
-    @cached_property
-    def _duration_stats(self):
-        _this_month_times = _this_week_times = 0
-        for card in self.history_manager.history_cards:
-            _date = card.date_time.split(' ')[0]
-            _date = datetime.strptime(_date, "%Y-%m-%d").date()
-            if _date.year == datetime.now().year and _date.month == datetime.now().month:
-                _this_month_times += 1
-            if _date.isocalendar().week == datetime.now().isocalendar().week:
-                _this_week_times += 1
-        return _this_month_times, _this_week_times
+        return self.stats.avg_minute
 
     @property
     def this_month_times(self):
-        return self._duration_stats[0]
+        return self.stats.this_month_times
 
     @property
     def this_week_times(self):
-        return self._duration_stats[1]
+        return self.stats.this_week_times
+
+    def _values(self) -> list[str]:
+        return [str(self.total_times), str(self.avg_minute), str(self.this_week_times), str(self.this_month_times)]
+
+    def _create_cards(self):
+        total, avg, week, month = self._values()
+        self.cards = [
+            StatCard("总次数", total),
+            StatCard("平均持续时间", avg, "分钟"),
+            StatCard("本周次数", week),
+            StatCard("本月次数", month),
+        ]
+        return self.cards
+
+    def did_mount(self):
+        self.period_watcher = self.page.run_task(self.watch_period)
 
-    def clear_time_stats_cache(self):
-        """ 清除缓存，当下次访问时会重新计算 """
-        if hasattr(self, '_time_stats'):
-            del self._time_stats
-        if hasattr(self, '_duration_stats'):
-            del self._duration_stats
+    def will_unmount(self):
+        if self.period_watcher is not None:
+            self.period_watcher.cancel()
+            self.period_watcher = None
+
+    async def watch_period(self):
+        """ 过了零点就检查日历周期，没有任何修改时本周、本月的次数也会按时更新
+
+        最多睡一小时，电脑休眠或调整了系统时间后也能在一小时内发现。
+        """
+        while True:
+            now = datetime.now()
+            midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+            await asyncio.sleep(min((midnight - now).total_seconds() + 1, 60 * 60))
+            self.refresh_period()
+
+    def refresh_period(self):
+        """ 日历周期切换了时更新本周、本月的次数 """
+        if self.stats.roll_period():
+            self._update()
 
     def _update(self):
-        self.clear_time_stats_cache()
-        if self.page:  # Ensure the page is available
-            self.grid.controls = [
-                create_card("总次数", str(self.total_times)),
-                create_card("平均持续时间", str(self.avg_minute), "分钟"),
-                create_card("本周次数", str(self.this_week_times)),
-                create_card("本月次数", str(self.this_month_times)),
-            ]
-            self.update()
+        """ 只更新数值变化了的卡片 """
+        with PROFILER.span('StatsView._update') as args:
+            self.stats.roll_period()
+            changed = [card for card, value in zip(self.cards, self._values()) if card.set_value(value)]
+            args['changed'] = len(changed)
+            if self.page:  # Ensure the page is available
+                for card in changed:
+                    card.value_text.update()
+                PROFILER.count('ui_updates', len(changed))
 
 
 class HomePage(ft.Column):
-    def __init__(self, history_manager: HistoryPage):
+    def __init__(self, repository: HistoryRepository, transfer: DataTransfer, editor: RecordEditor):
         super().__init__()
-        self.history_manager = history_manager
+        self.repository = repository
+        self.editor = editor
+        self.stats_view = StatsView(self.repository)
 
         self.controls = [
             ft.Row(
                 [
                     ft.Text("主页", size=28, weight=ft.FontWeight.BOLD),
-                    ft.IconButton(ft.Icons.ADD, on_click=lambda e: self.page.open(self.add_dlg))
+                    ft.IconButton(ft.Icons.ADD, on_click=lambda e: self.editor.open_add(self.page))
                 ],
                 alignment=ft.MainAxisAlignment.SPACE_BETWEEN
             ),
-            TimerCard(self.history_manager),
+            TimerCard(self.repository, transfer),
+            ft.Divider(),
+            self.stats_view,
             ft.Divider(),
-            StatsView(self.history_manager)
+            TrendsView(self.repository)
         ]
         self.expand = True
         self.alignment = ft.MainAxisAlignment.START
         self.spacing = 10
         self.scroll = ft.ScrollMode.HIDDEN
 
-        self.add_dlg = ft.AlertDialog(
-            modal=True,
-            title='添加记录',
-            content=ft.Column(
-                [
-                    ft.Row(
-                        [
-                            ft.TextField(label='年', width=65, keyboard_type=ft.KeyboardType.NUMBER,
-                                         on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_year')),
-                            ft.Text('-'),
-                            ft.TextField(label='月', width=50, keyboard_type=ft.KeyboardType.NUMBER,
-                                         on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_month')),
-                            ft.Text('-'),
-                            ft.TextField(label='日', width=50, keyboard_type=ft.KeyboardType.NUMBER,
-                                         on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_day')),
-                        ]
-                    ),
-                    ft.Row(
-                        [
-                            ft.TextField(label='时', width=50, keyboard_type=ft.KeyboardType.NUMBER,
-                                         on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_hour')),
-                            ft.Text(':'),
-                            ft.TextField(label='分', width=50, keyboard_type=ft.KeyboardType.NUMBER,
-                                         on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_minute')),
-                            ft.Text(':'),
-                            ft.TextField(label='秒', width=50, keyboard_type=ft.KeyboardType.NUMBER,
-                                         on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_second')),
-                        ]
-                    ),
-                    ft.Row(
-                        [
-                            ft.Text('持续时间：', size=18),
-                            ft.TextField(label='分', width=45, keyboard_type=ft.KeyboardType.NUMBER,
-                                         on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_minute_duration')),
-                            ft.TextField(label='秒', width=45, keyboard_type=ft.KeyboardType.NUMBER,
-                                         on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_second_duration'))
-                        ]
-                    ),
-                    ft.TextField(label='备注', width=230, on_change=lambda e: self.on_edit_dlg_change(e, 'tmp_note'))
-                ],
-                height=222
-            ),
-            actions=[
-                ft.TextButton("保存", on_click=self.save_change),
-                ft.TextButton("取消", on_click=lambda e: self.page.close(self.add_dlg)),
-            ],
-            actions_alignment=ft.MainAxisAlignment.END,
-            on_dismiss=lambda e: self.page.close(self.add_dlg)
-        )
-
-    def on_edit_dlg_change(self, e, name: str):
-        new_value = e.control.value
-        setattr(self, name, new_value)
-
-    def save_change(self, e):
-        self.date_time = f'{self.tmp_year}-{self.tmp_month}-{self.tmp_day} {self.tmp_hour}:{self.tmp_minute}:{self.tmp_second}'
-        self.minute_duration = int(self.tmp_minute_duration)
-        self.second_duration = int(self.tmp_second_duration)
-        self.note = self.tmp_note
-        to_add = [self.date_time, self.minute_duration, self.second_duration, self.note]
-        self.history_manager.add(data=to_add)
-        self.page.close(self.add_dlg)
+    def on_show(self):
+        """ 切换回主页时调用，离开期间跨过了周或月的话立即更新统计 """
+        self.stats_view.refresh_period()
@@ -1,11 +1,92 @@
-import flet as ft
+import os
+import sys
+import time
 
-from history import HistoryPage
-from settings import SettingsPage
-from home import HomePage, TimerCard
+STARTED_AT = time.perf_counter()
+
+from pathlib import Path  # noqa: E402
+
+import flet as ft  # noqa: E402
+
+from core.profiling import PROFILER  # noqa: E402
+from core.profiles import ProfileCache, Profiles  # noqa: E402
+from core.repository import HistoryRepository  # noqa: E402
+from editor import RecordEditor  # noqa: E402
+from home import HomePage, TimerCard  # noqa: E402
+from transfer import DataTransfer  # noqa: E402
+
+IMPORTED_AT = time.perf_counter()
+
+# 设置 DICK_HELPER_STARTUP_TIMING=1 时，把启动各阶段耗时和首帧时间输出到标准错误
+STARTUP_TIMING = bool(os.environ.get('DICK_HELPER_STARTUP_TIMING'))
+
+
+def report_startup(phases: list[tuple[str, float]]):
+    previous = STARTED_AT
+    for name, at in phases:
+        print(f"{name:>12} {(at - previous) * 1000:8.1f} ms", file=sys.stderr)
+        previous = at
+    print(f"{'first frame':>12} {(previous - STARTED_AT) * 1000:8.1f} ms", file=sys.stderr)
+
+
+class Workspace:
+    """ 一个档案的数据和页面
+
+    整个放进 ProfileCache：切换回最近用过的档案时，数据、统计和页面都还在内存中，不需要重新加载和计算。
+    """
+
+    def __init__(self, page: ft.Page, work_dir: Path):
+        self.page = page
+        # 写入在后台线程中进行，事件处理函数不等待磁盘；关闭时写完队列
+        self.repository = HistoryRepository(work_dir, write_behind=True)
+        self.repository.on_write_error = self.on_write_error
+        self.home_page: HomePage | None = None
+        self.history_page: ft.Control | None = None
+
+    def on_write_error(self, error: Exception):
+        self.page.snack_bar = ft.SnackBar(ft.Text(f"保存失败: {error}"), duration=3000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.ERROR))
+        self.page.open(self.page.snack_bar)
+        self.page.update()
+
+    def report_rejected(self):
+        rejected = self.repository.rejected
+        if rejected:
+            self.page.snack_bar = ft.SnackBar(
+                ft.Text(f"有 {len(rejected)} 行历史数据无法读取，已跳过并另存到 {self.repository.backend.rejected_file}"),
+                duration=5000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.ERROR))
+            self.page.open(self.page.snack_bar)
+
+    def build(self):
+        """ 构建主页，已经构建过时什么都不做 """
+        if self.home_page is not None:
+            return
+        self.report_rejected()
+        self.transfer = DataTransfer(self.repository)
+        self.page.overlay.append(self.transfer.file_picker)
+        self.editor = RecordEditor(self.repository)
+        self.home_page = HomePage(self.repository, self.transfer, self.editor)
+        self.timer_card = next(control for control in self.home_page.controls if isinstance(control, TimerCard))
+
+    def build_history_page(self) -> ft.Control:
+        # 历史页面在第一次切换过去时才导入和构建
+        if self.history_page is None:
+            from history import HistoryPage
+            self.history_page = HistoryPage(self.repository, self.editor)
+        return self.history_page
+
+    @property
+    def controls(self) -> list[ft.Control]:
+        return [control for control in (self.home_page, self.history_page) if control is not None]
+
+    def close(self):
+        if self.home_page is not None:
+            self.timer_card.cleanup()
+            self.page.overlay.remove(self.transfer.file_picker)
+        self.repository.close()
 
 
 def main(page: ft.Page):
+    phases = [('imports', IMPORTED_AT), ('page ready', time.perf_counter())]
     page.adaptive = True
     page.title = '牛子小助手'
     page.vertical_alignment = ft.MainAxisAlignment.CENTER
@@ -15,29 +96,56 @@ def main(page: ft.Page):
     page.window.resizable = False
     page.window.maximizable = False
 
-    history_page = HistoryPage()
-    page.overlay.append(history_page.file_picker)
-    settings_page = SettingsPage()
-    home_page = HomePage(history_page)
+    page_stack = ft.Stack(expand=True)
 
-    timer_card = None
-    for control in home_page.controls:
-        if isinstance(control, TimerCard):
-            timer_card = control
-            break
+    def close_workspace(evicted: Workspace):
+        page_stack.controls = [control for control in page_stack.controls if control not in evicted.controls]
+        evicted.close()
 
-    page_stack = ft.Stack(controls=[home_page, history_page, settings_page], expand=True)
+    profiles = Profiles(Path.cwd())
+    workspaces: ProfileCache[Workspace] = ProfileCache(lambda name, work_dir: Workspace(page, work_dir), close_workspace)
+    current = profiles.current
+    workspace = workspaces.get(current, profiles.directory(current))
+    phases.append(('load', time.perf_counter()))
+    workspace.build()
+    page_stack.controls.append(workspace.home_page)
+    phases.append(('build', time.perf_counter()))
 
-    def on_nav_change(e: ft.ControlEvent):
-        """ Handle navigation bar changes """
-        selected_index = e.control.selected_index
-        home_page.visible = (selected_index == 0)
-        history_page.visible = (selected_index == 1)
-        settings_page.visible = (selected_index == 2)
+    # 设置页面在第一次切换过去时才导入和构建，所有档案共用
+    settings_page: ft.Control | None = None
+    selected_index = 0
+
+    def show_page(index: int):
+        nonlocal settings_page, selected_index
+        selected_index = index
+        match index:
+            case 0:
+                target = workspace.home_page
+                target.on_show()
+            case 1:
+                target = workspace.build_history_page()
+            case _:
+                if settings_page is None:
+                    from settings import SettingsPage
+                    settings_page = SettingsPage(profiles, switch_profile)
+                target = settings_page
+        if target not in page_stack.controls:
+            page_stack.controls.append(target)
+        for control in page_stack.controls:
+            control.visible = control is target
         page.update()
 
-    history_page.visible = False
-    settings_page.visible = False
+    def switch_profile(name: str):
+        """ 切换档案，最近用过的档案直接从缓存中取出，被淘汰的档案会写完并关闭 """
+        nonlocal workspace
+        workspace = workspaces.get(name, profiles.directory(name))
+        workspace.build()
+        profiles.current = name
+        show_page(selected_index)
+
+    def on_nav_change(e: ft.ControlEvent):
+        """ Handle navigation bar changes """
+        show_page(e.control.selected_index)
 
     page.navigation_bar = ft.NavigationBar(
         destinations=[
@@ -63,7 +171,17 @@ def main(page: ft.Page):
     )
 
     page.add(page_stack)
-    page.on_close = lambda: timer_card.cleanup()
+    phases.append(('render', time.perf_counter()))
+    if STARTUP_TIMING:
+        report_startup(phases)
+
+    def on_close(e):
+        workspaces.close()
+        # 开启了性能分析时，退出前把记录的数据导出到工作目录
+        if PROFILER.enabled:
+            print(f"profile written to {PROFILER.export(profiles.root)}", file=sys.stderr)
+
+    page.on_close = on_close
 
 
 ft.app(main)
@@ -1,9 +1,27 @@
+from pathlib import Path
+from typing import Callable
+
 import flet as ft
 
+from core.profiles import Profiles
+from core.profiling import PROFILER
+
 
 class SettingsPage(ft.Column):
-    def __init__(self):
+    def __init__(self, profiles: Profiles, on_switch_profile: Callable[[str], None]):
         super().__init__()
+        self.profiles = profiles
+        self.on_switch_profile = on_switch_profile
+        self.work_dir = profiles.root
+
+        self.profile_dropdown = ft.Dropdown(
+            value=profiles.current,
+            options=self._profile_options(),
+            expand=True,
+            dense=True,
+            on_change=self.on_profile_select
+        )
+        self.new_profile_field = ft.TextField(hint_text="新档案名称", expand=True, dense=True, on_submit=self.create_profile)
 
         self.theme_group = ft.RadioGroup(
             value="system",
@@ -54,6 +72,20 @@ class SettingsPage(ft.Column):
             )
         )
 
+        self.profile_switch = ft.Switch(label="记录性能数据", value=PROFILER.enabled, on_change=self.on_profiling_change)
+        self.cprofile_switch = ft.Switch(
+            label="采集函数调用 (cProfile)",
+            value=PROFILER.cprofile,
+            disabled=not PROFILER.enabled,
+            on_change=self.on_profiling_change
+        )
+        self.profile_export_button = ft.OutlinedButton(
+            "导出性能数据",
+            icon=ft.Icons.FILE_DOWNLOAD,
+            disabled=not PROFILER.enabled,
+            on_click=self.export_profile
+        )
+
         self.app_details = ft.Column(
             [
                 ft.Text("APP 版本:", size=16),
@@ -76,6 +108,13 @@ class SettingsPage(ft.Column):
             ft.Text("主题", size=16, weight=ft.FontWeight.NORMAL),
             self.theme_group,
             ft.Divider(),
+            ft.Text("档案", size=16, weight=ft.FontWeight.NORMAL),
+            ft.Row([ft.Icon(ft.Icons.PERSON, size=24), self.profile_dropdown]),
+            ft.Row([self.new_profile_field, ft.IconButton(ft.Icons.ADD, on_click=self.create_profile)]),
+            ft.Divider(),
+            ft.Text("性能分析", size=16, weight=ft.FontWeight.NORMAL),
+            ft.Column([self.profile_switch, self.cprofile_switch, self.profile_export_button], spacing=12),
+            ft.Divider(),
             ft.Text("应用信息", size=16, weight=ft.FontWeight.NORMAL),
             ft.Row([self.app_details, self.version_values], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
         ]
@@ -94,6 +133,42 @@ class SettingsPage(ft.Column):
                 self.page.theme_mode = ft.ThemeMode.SYSTEM
         self.page.update()
 
+    def _profile_options(self) -> list[ft.dropdown.Option]:
+        return [ft.dropdown.Option(name) for name in self.profiles.names()]
+
+    def on_profile_select(self, e: ft.ControlEvent):
+        self.on_switch_profile(self.profile_dropdown.value)
+
+    def create_profile(self, e: ft.ControlEvent):
+        name = (self.new_profile_field.value or '').strip()
+        try:
+            self.profiles.create(name)
+        except (ValueError, OSError) as ex:
+            self.new_profile_field.error_text = str(ex)
+            self.new_profile_field.update()
+            return
+        self.new_profile_field.value = ''
+        self.new_profile_field.error_text = None
+        self.profile_dropdown.options = self._profile_options()
+        self.profile_dropdown.value = name
+        self.update()
+        self.on_switch_profile(name)
+
+    def on_profiling_change(self, e: ft.ControlEvent):
+        PROFILER.configure(self.profile_switch.value, self.cprofile_switch.value)
+        self.cprofile_switch.disabled = not PROFILER.enabled
+        self.profile_export_button.disabled = not PROFILER.enabled
+        self.update()
+
+    def export_profile(self, e: ft.ControlEvent):
+        try:
+            path = PROFILER.export(self.work_dir)
+            self.page.snack_bar = ft.SnackBar(ft.Text(f"已导出到 {path}"), duration=3000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.PRIMARY))
+        except OSError as ex:
+            self.page.snack_bar = ft.SnackBar(ft.Text(f"导出失败: {ex}"), duration=3000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.ERROR))
+        self.page.open(self.page.snack_bar)
+        self.page.update()
+
 
 if __name__ == "__main__":
     def main(page: ft.Page):
@@ -104,6 +179,6 @@ if __name__ == "__main__":
         page.window.height = 700
         page.window.resizable = False
         page.window.maximizable = False
-        page.add(SettingsPage())
+        page.add(SettingsPage(Profiles(Path.cwd()), lambda name: None))
 
     ft.app(main)
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import flet as ft
+
+from core.export import COMPRESSION_SUFFIXES, COMPRESSIONS, ExportProgress, HistoryExport
+from core.importer import CsvImport, ImportProgress, MergePolicy
+from core.profiling import PROFILER
+from core.repository import HistoryRepository
+
+
+class DataTransfer:
+    """ 导入导出的界面逻辑：文件选择器、冲突处理对话框和进度提示
+
+    不依赖任何页面，主页的导入导出按钮在历史页面构建之前就可以使用。
+    `file_picker` 需要加入 `page.overlay`。
+    """
+
+    def __init__(self, repository: HistoryRepository):
+        self.repository = repository
+        self.file_picker = ft.FilePicker(on_result=self.on_file_picker_result)
+        self.export_format = 'csv'
+        self.export_compression: str | None = None
+
+    @property
+    def page(self) -> ft.Page:
+        return self.file_picker.page
+
+    def export_history(self, e):
+        """ 先选择格式和压缩方式，再选择保存位置 """
+        format_group = ft.RadioGroup(
+            value=self.export_format,
+            content=ft.Column(
+                [
+                    ft.Radio(value='csv', label='CSV（可以再导入）'),
+                    ft.Radio(value='jsonl', label='JSON Lines'),
+                    ft.Radio(value='columnar', label='列式二进制（体积最小）'),
+                ],
+                tight=True
+            )
+        )
+        compression_dropdown = ft.Dropdown(
+            label='压缩',
+            value=self.export_compression or 'none',
+            options=[ft.dropdown.Option('none', '不压缩'), *(ft.dropdown.Option(name) for name in COMPRESSIONS)],
+            dense=True
+        )
+
+        def choose_path(e):
+            self.page.close(export_dlg)
+            self.export_format = format_group.value
+            self.export_compression = None if compression_dropdown.value == 'none' else compression_dropdown.value
+            self.file_picker.save_file(
+                dialog_title="选择导出路径",
+                file_name=HistoryExport.file_name('history', self.export_format, self.export_compression)
+            )
+
+        export_dlg = ft.AlertDialog(
+            modal=True,
+            title='导出记录',
+            content=ft.Column([format_group, compression_dropdown], tight=True),
+            actions=[
+                ft.TextButton("选择位置", on_click=choose_path),
+                ft.TextButton("取消", on_click=lambda e: self.page.close(export_dlg)),
+            ],
+            actions_alignment=ft.MainAxisAlignment.END
+        )
+        self.page.open(export_dlg)
+
+    def import_csv(self, e):
+        self.file_picker.pick_files(
+            dialog_title="选择导入文件",
+            allowed_extensions=['csv', 'dhc', *(suffix[1:] for suffix in COMPRESSION_SUFFIXES.values())],
+            allow_multiple=False
+        )
+
+    def on_file_picker_result(self, e: ft.FilePickerResultEvent):
+        """ 处理文件选择器结果的回调 """
+        if e.path:
+            self.export_history_to_path(Path(e.path))
+        elif e.files and e.files[0]:
+            self.open_merge_dlg(Path(e.files[0].path))
+        else:
+            self.page.snack_bar = ft.SnackBar(ft.Text("操作已取消。"), duration=2000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.SECONDARY))
+            self.page.open(self.page.snack_bar)
+            self.page.update()
+
+    def export_history_to_path(self, save_path: Path):
+        """ 在后台线程中流式导出，导出过程中显示进度，可以随时取消 """
+        job = HistoryExport(save_path, self.export_format, self.export_compression)
+        self.export_progress_text = ft.Text("正在导出…")
+        self.export_progress_bar = ft.ProgressBar(value=0, width=300)
+        self.page.snack_bar = ft.SnackBar(
+            ft.Column([self.export_progress_text, self.export_progress_bar], tight=True),
+            action="取消",
+            on_action=lambda e: job.cancel(),
+            duration=24 * 60 * 60 * 1000,  # 导出结束后会被结果提示替换
+            bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.SECONDARY)
+        )
+        self.page.open(self.page.snack_bar)
+        self.page.update()
+        self.page.run_thread(self._run_export, job)
+
+    def _show_export_progress(self, progress: ExportProgress):
+        self.export_progress_text.value = f"已导出 {progress.rows} / {progress.total} 条（{progress.percent:.0f}%）"
+        self.export_progress_bar.value = progress.percent / 100
+        self.page.snack_bar.update()
+        PROFILER.count('ui_updates')
+
+    def _run_export(self, job: HistoryExport):
+        try:
+            with PROFILER.span('DataTransfer.export'):
+                rows = self.repository.export(job, self._show_export_progress)
+            if job.cancelled:
+                self.page.snack_bar = ft.SnackBar(ft.Text("导出已取消。"), duration=2000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.SECONDARY))
+            else:
+                self.page.snack_bar = ft.SnackBar(ft.Text(f"已导出 {rows} 条记录！路径: {job.path}"), duration=2000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.PRIMARY))
+        except Exception as ex:
+            self.page.snack_bar = ft.SnackBar(ft.Text(f"导出失败: {ex}"), duration=2000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.ERROR))
+        finally:
+            self.page.open(self.page.snack_bar)
+            self.page.update()
+
+    def open_merge_dlg(self, file_path: Path):
+        """ 导入前选择与已有记录冲突时的处理方式 """
+        policy_group = ft.RadioGroup(
+            value=MergePolicy.SKIP.value,
+            content=ft.Column(
+                [
+                    ft.Radio(value=MergePolicy.SKIP.value, label='保留已有记录'),
+                    ft.Radio(value=MergePolicy.OVERWRITE.value, label='用导入的记录覆盖'),
+                    ft.Radio(value=MergePolicy.KEEP_BOTH.value, label='两条都保留'),
+                ],
+                tight=True
+            )
+        )
+
+        def start(e):
+            self.page.close(merge_dlg)
+            self.import_history_from_path(file_path, MergePolicy(policy_group.value))
+
+        merge_dlg = ft.AlertDialog(
+            modal=True,
+            title='导入记录',
+            content=ft.Column(
+                [
+                    ft.Text('完全相同的记录会被跳过。时间相同但内容不同时：'),
+                    policy_group
+                ],
+                tight=True
+            ),
+            actions=[
+                ft.TextButton("导入", on_click=start),
+                ft.TextButton("取消", on_click=lambda e: self.page.close(merge_dlg)),
+            ],
+            actions_alignment=ft.MainAxisAlignment.END
+        )
+        self.page.open(merge_dlg)
+
+    def import_history_from_path(self, file_path: Path, policy: MergePolicy = MergePolicy.SKIP):
+        """ 在后台线程中分批导入，导入过程中显示进度，可以随时取消 """
+        try:
+            job = CsvImport.for_path(file_path)
+        except ValueError as ex:
+            self.page.snack_bar = ft.SnackBar(ft.Text(f"导入失败: {ex}"), duration=2000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.ERROR))
+            self.page.open(self.page.snack_bar)
+            self.page.update()
+            return
+        self.import_progress_text = ft.Text("正在导入…")
+        self.import_progress_bar = ft.ProgressBar(value=0, width=300)
+        self.page.snack_bar = ft.SnackBar(
+            ft.Column([self.import_progress_text, self.import_progress_bar], tight=True),
+            action="取消",
+            on_action=lambda e: job.cancel(),
+            duration=24 * 60 * 60 * 1000,  # 导入结束后会被结果提示替换
+            bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.SECONDARY)
+        )
+        self.page.open(self.page.snack_bar)
+        self.page.update()
+        self.page.run_thread(self._run_import, job, policy)
+
+    def _show_import_progress(self, progress: ImportProgress):
+        self.import_progress_text.value = f"已导入 {progress.rows} 条（{progress.percent:.0f}%，{progress.rows_per_second:.0f} 条/秒）"
+        self.import_progress_bar.value = progress.percent / 100
+        self.page.snack_bar.update()
+        PROFILER.count('ui_updates')
+
+    def _run_import(self, job: CsvImport, policy: MergePolicy):
+        try:
+            with PROFILER.span('DataTransfer.import', path=str(job.path)) as args:
+                report = self.repository.import_csv(job, policy, self._show_import_progress)
+                args['rows'] = job.rows
+            summary = f"新增 {report.new} 条，重复 {report.duplicate} 条，冲突 {report.conflicting} 条。"
+            if job.cancelled:
+                self.page.snack_bar = ft.SnackBar(ft.Text(f"导入已取消，已处理 {job.rows} 条记录：{summary}"), duration=3000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.SECONDARY))
+            else:
+                self.page.snack_bar = ft.SnackBar(ft.Text(f"导入完成：{summary}"), duration=3000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.PRIMARY))
+
+        except FileNotFoundError:
+            self.page.snack_bar = ft.SnackBar(ft.Text("文件未找到。"), duration=2000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.ERROR))
+        except Exception as ex:
+            message = f"导入失败: {ex}" + (f"（此前已处理 {job.rows} 条记录）" if job.rows else "")
+            self.page.snack_bar = ft.SnackBar(ft.Text(message), duration=2000, bgcolor=ft.Colors.with_opacity(0.8, ft.Colors.ERROR))
+        finally:
+            self.page.open(self.page.snack_bar)
+            self.page.update()
@@ -0,0 +1,157 @@
+import threading
+
+import flet as ft
+
+from core.analytics import ROLLING_DAYS, TrendAnalyzer, TrendReport, TrendWindow
+from core.events import ChangeEvent
+from core.repository import HistoryRepository
+
+WINDOW_LABELS = {
+    TrendWindow.WEEK: '7天',
+    TrendWindow.MONTH: '30天',
+    TrendWindow.QUARTER: '90天',
+    TrendWindow.YEAR: '一年',
+    TrendWindow.ALL: '全部',
+}
+WEEKDAY_LABELS = ['一', '二', '三', '四', '五', '六', '日']
+BAR_HEIGHT = 60
+
+
+def format_gap(seconds: int) -> str:
+    if seconds >= 24 * 60 * 60:
+        return f'{seconds / (24 * 60 * 60):.1f}天'
+    return f'{seconds / (60 * 60):.1f}小时'
+
+
+def bar_chart(values: list[int | float], labels: list[str]) -> ft.Row:
+    """ 用容器拼出的简单柱状图，柱子按最大值缩放 """
+    chart = ft.Row(
+        spacing=1,
+        height=BAR_HEIGHT + 16,
+        vertical_alignment=ft.CrossAxisAlignment.END
+    )
+    set_bars(chart, values, labels)
+    return chart
+
+
+def set_bars(chart: ft.Row, values: list[int | float], labels: list[str]):
+    """ 把柱状图改为新的数据，柱子数量不变时只修改已有柱子的高度、颜色和文字 """
+    if len(chart.controls) != len(values):
+        chart.controls = [
+            ft.Column(
+                controls=[
+                    ft.Container(border_radius=ft.border_radius.only(top_left=2, top_right=2)),
+                    ft.Text(size=9)
+                ],
+                spacing=2,
+                expand=True,
+                alignment=ft.MainAxisAlignment.END,
+                horizontal_alignment=ft.CrossAxisAlignment.CENTER
+            )
+            for _ in values
+        ]
+    peak = max(values, default=0) or 1
+    for column, value, label in zip(chart.controls, values, labels):
+        bar, text = column.controls
+        bar.height = max(1, BAR_HEIGHT * value / peak)
+        bar.bgcolor = ft.Colors.BLUE_300 if value else ft.Colors.GREY_300
+        bar.tooltip = f'{label}：{value}'
+        text.value = label
+
+
+def count_series(report: TrendReport, window: TrendWindow) -> tuple[list[int], list[str]]:
+    """ 短范围按天显示，90 天按周显示，更长的按月显示 """
+    if window in (TrendWindow.WEEK, TrendWindow.MONTH):
+        labels = [str(day - report.first_day + 1) if (report.last_day - day) % 5 == 0 else '' for day in range(report.first_day, report.last_day + 1)]
+        return report.daily_counts, labels
+    if window is TrendWindow.QUARTER:
+        return [count for _, count in report.weekly_counts], [str(week) for (_, week), _ in report.weekly_counts]
+    monthly = report.monthly_counts[-24:]
+    return [count for _, count in monthly], [str(month) for (_, month), _ in monthly]
+
+
+class TrendsView(ft.Container):
+    """ 按时间范围显示的趋势：次数、连续天数、间隔、时段分布和持续时间分位数 """
+
+    def __init__(self, repository: HistoryRepository):
+        super().__init__()
+        # 报告在延迟投递的线程中计算，读取 store 时需要持有修改它的锁
+        self.analyzer = TrendAnalyzer(repository.store, repository.lock)
+        self.window = TrendWindow.MONTH
+        self._update_lock = threading.Lock()
+        # 数据变化时同步清空缓存，界面刷新合并到下一帧
+        repository.subscribe(ChangeEvent, self.analyzer.handle)
+        repository.register_callback(self._update, deferred=True)
+
+        self.window_selector = ft.SegmentedButton(
+            segments=[ft.Segment(value=window.name, label=ft.Text(label)) for window, label in WINDOW_LABELS.items()],
+            selected={self.window.name},
+            show_selected_icon=False,
+            on_change=self.on_window_change
+        )
+        self.body = ft.Column(self._build_body(), spacing=12)
+        self._show(self.analyzer.report(self.window))
+        self.content = ft.Column(
+            [
+                ft.Text(
+                    "趋势",
+                    size=24,
+                    weight=ft.FontWeight.BOLD,
+                    color=ft.Colors.BLUE
+                ),
+                self.window_selector,
+                self.body
+            ],
+            spacing=20
+        )
+        self.padding = ft.padding.all(20)
+
+    def _build_body(self) -> list[ft.Control]:
+        """ 创建各项的控件，内容由 `_show` 填入 """
+        self.summary_text = ft.Text(size=14)
+        self.count_chart = bar_chart([], [])
+        self.streak_text = ft.Text(size=14)
+        self.gap_text = ft.Text(size=14)
+        self.percentile_text = ft.Text(size=14)
+        self.hour_chart = bar_chart([], [])
+        self.weekday_chart = bar_chart([], [])
+        self.report: TrendReport | None = None
+        return [
+            self.summary_text,
+            self.count_chart,
+            self.streak_text,
+            self.gap_text,
+            self.percentile_text,
+            ft.Text('时段分布', size=14, weight=ft.FontWeight.BOLD),
+            self.hour_chart,
+            ft.Text('星期分布', size=14, weight=ft.FontWeight.BOLD),
+            self.weekday_chart,
+        ]
+
+    def _show(self, report: TrendReport) -> bool:
+        """ 把报告填入已有的控件，报告没有变化时什么都不做并返回 False """
+        if report is self.report:
+            return False
+        self.report = report
+        counts, labels = count_series(report, self.window)
+        percentiles = '  '.join(f'P{p} {seconds // 60}分{seconds % 60}秒' for p, seconds in report.duration_percentiles.items()) or '暂无'
+        rolling = report.rolling_avg_minutes[-1] if report.rolling_avg_minutes else 0
+        self.summary_text.value = f'共 {report.times} 次，近{ROLLING_DAYS}天平均 {rolling} 分钟'
+        set_bars(self.count_chart, counts, labels)
+        self.streak_text.value = f'当前连续 {report.current_streak} 天，最长连续 {report.longest_streak} 天'
+        self.gap_text.value = f'最长间隔 {format_gap(report.longest_gap)}，间隔中位数 {format_gap(report.median_gap)}'
+        self.percentile_text.value = f'持续时间：{percentiles}'
+        set_bars(self.hour_chart, report.hour_histogram, [str(hour) if hour % 6 == 0 else '' for hour in range(24)])
+        set_bars(self.weekday_chart, report.weekday_histogram, WEEKDAY_LABELS)
+        return True
+
+    def on_window_change(self, e):
+        self.window = TrendWindow[next(iter(e.control.selected))]
+        self._update()
+
+    def _update(self):
+        """ 在已有的控件上修改，只有变化了的属性会发送到界面 """
+        # 延迟刷新的线程和切换范围的事件处理可能同时进来
+        with self._update_lock:
+            if self._show(self.analyzer.report(self.window)) and self.page:  # Ensure the page is available
+                self.body.update()